@@ -2,92 +2,70 @@
 """Start the LNXlink service"""
 
 import argparse
-import inspect
+import concurrent.futures
 import json
 import logging
 import os
 import platform
+import random
 import sys
 import threading
 import time
 import traceback
-from collections import OrderedDict
 
-from lnxlink import config_setup, modules
-from lnxlink.discovery_registry import DiscoveryRegistry
+from lnxlink import modules
+from lnxlink.discovery import Discovery
 from lnxlink.modules.scripts import helpers
-from lnxlink.mqtt import MQTT
-from lnxlink.system_monitor import GracefulKiller, MonitorSuspend
-
-version, path = helpers.get_version()
-INSTALL_METHOD = helpers.get_install_method()
+from lnxlink.publishing import (
+    PublishStore,
+    UniqueQueue,
+    payload_digest,
+    round_at,
+    template_path,
+    value_at,
+    within_deadband,
+    without_paths,
+)
+from lnxlink.scheduler import Scheduler
+from lnxlink.spool import Spool
+
+# Loaded when they are first used, so that lnxlink --version stays fast
+config_setup = helpers.lazy_import("lnxlink.config_setup")
+lnxlink_mqtt = helpers.lazy_import("lnxlink.mqtt")
+system_sampler = helpers.lazy_import("lnxlink.system_sampler")
+event_sources = helpers.lazy_import("lnxlink.event_sources")
+system_monitor = helpers.lazy_import("lnxlink.system_monitor")
 logger = logging.getLogger("lnxlink")
-
-
-class UniqueQueue:
-    """
-    A queue that maintains unique named items with a maximum size limit.
-    If an item with the same name is added, it replaces the old one.
-    When full, the oldest item is discarded to make room.
-    """
-
-    def __init__(self, max_size=200):
-        """Initializes the UniqueQueue"""
-        self.queue = OrderedDict()
-        self.max_size = max_size
-        self._lock = threading.Lock()
-
-    def __repr__(self):
-        """Returns a string representation of the queue."""
-        return f"<{self.__class__.__name__} queue: {repr(self.queue)}>"
-
-    def __iter__(self):
-        """Returns an iterator that yields and removes items from the queue in FIFO order"""
-        while True:
-            with self._lock:
-                if not self.queue:
-                    break
-                yield self.queue.popitem(last=False)
-
-    def add_item(self, name, value, retain=True, force_publish=False):
-        """Adds an item to the queue. If the item already exists, it replaces it"""
-        with self._lock:
-            if name in self.queue:
-                del self.queue[name]
-            elif len(self.queue) >= self.max_size:
-                self.queue.popitem(last=False)
-            self.queue[name] = (value, retain, force_publish)
-
-    def get_item(self):
-        """Retrieves and removes the next item from the queue (FIFO)"""
-        with self._lock:
-            if self.queue:
-                return self.queue.popitem(last=False)
-        return None, None
-
-    def clear(self):
-        """Clears all items from the queue"""
-        with self._lock:
-            self.queue.clear()
-
-
-# pylint: disable=too-many-instance-attributes
+# Configuration that is applied without restarting LNXlink
+RELOADABLE_KEYS = {
+    "settings",
+    "modules",
+    "custom_modules",
+    "exclude",
+    "update_interval",
+    "update_on_change",
+}
+# Set while starting instead of being read from the configuration file
+RUNTIME_KEYS = {"version", "config_path", "pref_topic", "registry_path"}
+
+
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
 class LNXlink:
     """Start LNXlink service that loads all modules and connects to MQTT"""
 
-    version = version
-    path = path
-    install_method = INSTALL_METHOD
+    max_failures = 5
 
+    # pylint: disable=too-many-statements
     def __init__(self, config):
+        self.version, self.path, self.install_method = helpers.get_install_info()
         logger.info(
             "LNXlink %s, Python %s, Install method: %s",
             self.version,
             platform.python_version(),
-            INSTALL_METHOD,
+            self.install_method,
         )
         logger.debug("Path=%s", self.path)
-        config["version"] = version
+        config["version"] = self.version
         self.config = config
         self.config_path = config["config_path"]
         self.kill = True
@@ -95,60 +73,223 @@ class LNXlink:
         self.inference_times = {}
         self.module_failures = {}
         self.addons = {}
+        self.addon_services = {}
+        self.init_times = {}
+        self.pending_addons = {}
+        self.late_addons = set()
+        self.init_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=int(self.config.get("init_workers") or 8),
+            thread_name_prefix="lnxlink_init",
+        )
+        self.provisioner = helpers.start_provisioning(
+            self.config.get("wheelhouse") or None
+        )
+        self.provisioner.add_listener(self._dependency_installed)
+        self.settings_lock = threading.Lock()
+        self.pending_settings = []
         self.prev_publish = {}
-        self.saved_publish = {}
+        self.refresh_deadlines = {}
+        self.publish_filters = {}
+        self.publish_qos = {}
+        self.filter_topics = {}
+        self.filtered_publish = {}
+        self.saved_publish = PublishStore(
+            budget=self.config.get("saved_publish_budget", 4 * 1024**2)
+        )
         self.update_change_interval = 900
-        self.discovery_registry = DiscoveryRegistry(self.config)
+        spool_config = self.config.get("spool") or {}
+        self.spool_modules = set(spool_config.get("modules") or [])
+        # Data are published under the addon name, the config lists services
+        self.spool_published = {}
+        self.spool = None
+        if self.spool_modules:
+            config_dir = os.path.dirname(os.path.realpath(self.config_path))
+            self.spool = Spool(
+                spool_config.get("path") or os.path.join(config_dir, "spool.bin"),
+                spool_config.get("size", 1024**2),
+            )
+        self.update_change_jitter = 0.2
         self.excluded_modules = set()
+        self.exclude_modules_arg = []
+        self.loaded_modules = {}
+        self.reload_lock = threading.Lock()
+        self.sampler = system_sampler.SystemSampler()
+        self.stale_modules = frozenset()
+        self.publish_latency = {}
+        self.scheduler = Scheduler(self)
+
+        self.startup_metrics = {}
+        self.connect_time = None
+        self.discovery = Discovery(self)
+
+        # Event loop shared by the async addons and transports
+        self.events = event_sources.EventSources()
+        self.loop = self.events.loop
 
         # Read configuration from yaml file
-        self.publ_queue = UniqueQueue()
-        self.mqtt = MQTT(self.config)
+        self.publ_queue = UniqueQueue(self.config.get("publish_queue"))
+        self.mqtt = lnxlink_mqtt.MQTT(self.config, self.loop)
+        self.mqtt.on_publish_failed = self._publish_failed
+        self.publish_rate = float(self.config.get("publish_rate") or 0)
+        discovery_rate = self.publish_rate or float(
+            self.config["mqtt"]["discovery"].get("rate", 100) or 0
+        )
+        if discovery_rate > 0:
+            self.mqtt.discovery_delay = 1 / discovery_rate
         self.stop_event = threading.Event()
 
     def start(self, exclude_modules_arg):
         """Run each addon included in the modules folder"""
-        conf_exclude = self.config["exclude"]
+        self.exclude_modules_arg = list(exclude_modules_arg)
+        loaded_modules = self._parse_modules(self.config)
+        self.loaded_modules = loaded_modules
+        # Addons are initialized in parallel while connecting to MQTT, the ones
+        # that miss their startup deadline are added when they are ready
+        start_time = time.monotonic()
+        addon_futures = {
+            self.init_pool.submit(self._init_addon, addon): addon
+            for addon in loaded_modules.values()
+        }
+        mqtt_status = self.mqtt.setup_mqtt(self.on_connect, self.on_message)
+        deadlines = {
+            future: start_time + self._startup_timeout(addon)
+            for future, addon in addon_futures.items()
+        }
+        for future in sorted(deadlines, key=deadlines.get):
+            try:
+                future.result(timeout=max(deadlines[future] - time.monotonic(), 0))
+            except concurrent.futures.TimeoutError:
+                service = addon_futures[future].service
+                self.late_addons.add(service)
+                future.add_done_callback(
+                    lambda _, service=service: self.late_addons.discard(service)
+                )
+        self._write_pending_settings()
+        loaded = list(self.addons.keys())
+        loaded.sort()
+        logger.info("Loaded addons: %s", ", ".join(loaded))
+        if self.late_addons:
+            logger.warning(
+                "Addons still initializing after their startup_timeout: %s",
+                ", ".join(sorted(self.late_addons)),
+            )
+        if self.pending_addons:
+            logger.info(
+                "Addons waiting for packages: %s",
+                ", ".join(sorted(self.pending_addons)),
+            )
+        for service, init_time in sorted(
+            self.init_times.items(), key=lambda item: item[1], reverse=True
+        ):
+            logger.debug("Addon %s initialized in %.3f seconds", service, init_time)
+
+        threading.Thread(target=self.scheduler.monitor_run, daemon=True).start()
+        threading.Thread(target=self.monitor_queue, daemon=True).start()
+        threading.Thread(target=self.discovery.worker, daemon=True).start()
+        return mqtt_status
+
+    def _parse_modules(self, config):
+        """Imports the addons of the configuration, except the excluded ones"""
+        conf_exclude = config["exclude"]
         conf_exclude = [] if conf_exclude is None else list(conf_exclude)
-        conf_exclude.extend(exclude_modules_arg)
+        conf_exclude.extend(self.exclude_modules_arg)
         conf_exclude = [
             module.strip().lower().replace("-", "_")
             for module in conf_exclude
             if isinstance(module, str) and module.strip()
         ]
         self.excluded_modules = set(conf_exclude)
-        loaded_modules = modules.parse_modules(
-            self.config["modules"], self.config["custom_modules"], conf_exclude
+        return modules.parse_modules(
+            list(config["modules"] or []),
+            list(config["custom_modules"] or []),
+            conf_exclude,
         )
-        for _, addon in loaded_modules.items():
-            try:
-                tmp_addon = addon(self)
-                self.addons[addon.service] = tmp_addon
-            except Exception as err:
-                logger.error(
-                    "Error with addon %s, please remove it from your config: %s",
-                    addon.service,
-                    err,
-                )
-                logger.debug(
-                    traceback.format_exc(),
-                )
-        loaded = list(self.addons.keys())
-        loaded.sort()
-        logger.info("Loaded addons: %s", ", ".join(loaded))
 
-        mqtt_status = self.mqtt.setup_mqtt(self.on_connect, self.on_message)
-        threading.Thread(target=self.monitor_run, daemon=True).start()
-        threading.Thread(target=self.monitor_queue, daemon=True).start()
-        return mqtt_status
+    def _init_addon(self, addon):
+        """Creates an addon and measures how long it takes"""
+        start_time = time.monotonic()
+        try:
+            tmp_addon = addon(self)
+            self.addons[addon.service] = tmp_addon
+            self.addon_services[tmp_addon.name] = addon.service
+        except helpers.DependencyPending as err:
+            logger.info(
+                "Addon %s is pending the installation of %s", addon.service, err
+            )
+            self.pending_addons[addon.service] = addon
+            return
+        except Exception as err:
+            logger.error(
+                "Error with addon %s, please remove it from your config: %s",
+                addon.service,
+                err,
+            )
+            logger.debug(
+                traceback.format_exc(),
+            )
+            return
+        finally:
+            self.init_times[addon.service] = round(time.monotonic() - start_time, 3)
+        # Discovery has already started without this addon
+        if self.connect_time is not None:
+            logger.info(
+                "Addon %s is ready after %.3f seconds",
+                addon.service,
+                self.init_times[addon.service],
+            )
+            if self.config["mqtt"]["discovery"]["enabled"]:
+                self.request_discovery(addon.service)
+            else:
+                self.setup_publish_filters()
 
-    def add_settings(self, name, settings, replace_empty=False):
-        """Adds missing configuration under settings"""
-        self.config = config_setup.add_settings(
-            self.config, name, settings, replace_empty
+    def _startup_timeout(self, addon):
+        """Returns the seconds that the startup waits for an addon"""
+        return float(
+            self.scheduler.module_option(
+                addon.service,
+                addon,
+                "startup_timeout",
+                self.config.get("startup_timeout", 10),
+            )
+        )
+
+    def _dependency_installed(self, package_version, success):
+        """Initializes again the addons that waited for a package, the ones
+        that can't import a failed package keep waiting for its retry"""
+        logger.info(
+            "Installation of %s %s",
+            package_version,
+            "finished" if success else "failed",
         )
+        for service, addon in list(self.pending_addons.items()):
+            if self.pending_addons.pop(service, None) is not None:
+                self.init_pool.submit(self._init_addon, addon)
 
-    def publish_monitor_data(self, name, pub_data, retain=True, force_publish=False):
+    def add_settings(self, name, settings, replace_empty=False):
+        """Adds missing configuration under settings"""
+        with self.settings_lock:
+            missing_keys = config_setup.missing_settings(
+                self.config, name, settings, replace_empty
+            )
+            if not missing_keys:
+                return
+            # Written once after the addons are initialized during startup
+            if self.pending_settings is not None:
+                self.pending_settings.extend(missing_keys)
+                return
+            config_setup.write_settings(self.config, missing_keys)
+
+    def _write_pending_settings(self):
+        """Writes the settings that were added during startup to the config"""
+        with self.settings_lock:
+            pending_settings, self.pending_settings = self.pending_settings, None
+            if pending_settings:
+                config_setup.write_settings(self.config, pending_settings)
+
+    # pylint: disable=too-many-arguments,too-many-branches,too-many-locals
+    def publish_monitor_data(
+        self, name, pub_data, retain=True, force_publish=False, lane="telemetry"
+    ):
         """Publish info data to mqtt in the correct format"""
         subtopic = helpers.text_to_topic(name)
         topic = f"{self.config['pref_topic']}/monitor_controls/{subtopic}"
@@ -165,63 +306,210 @@ class LNXlink:
         if isinstance(pub_data, list):
             if all(v is None for v in pub_data):
                 return
+        publish_filters = self.publish_filters.get(topic)
+        if publish_filters:
+            for path, publish_filter in publish_filters.items():
+                pub_data = round_at(pub_data, path, publish_filter.get("precision"))
+            skip = self._skip_filtered(topic, pub_data, publish_filters)
+            if skip and not force_publish:
+                return
+            self.filtered_publish[topic] = (pub_data, time.monotonic())
         if isinstance(pub_data, (dict, list)):
             pub_data = json.dumps(pub_data)
 
         # User option that checks and sends only the updated sensors
-        update_change_time = time.time() - self.prev_publish.get("last_update", 0)
-        if update_change_time > self.update_change_interval:
-            self.prev_publish = {"last_update": time.time()}
+        now = time.monotonic()
+        digest = payload_digest(pub_data)
         if (
             (self.config["update_on_change"] or isinstance(pub_data, bytes))
-            and self.prev_publish.get(topic) == pub_data
+            and self.prev_publish.get(topic) == digest
+            and now < self.refresh_deadlines.get(topic, 0)
             and not force_publish
         ):
             return
 
-        self.prev_publish[topic] = pub_data
+        self.prev_publish[topic] = digest
+        self.refresh_deadlines[topic] = self._next_refresh(now)
         self.saved_publish[subtopic.replace("/", "_")] = pub_data
-        self.mqtt.publish(topic, pub_data, retain)
-
-    def run_module(self, name, method, retain=True, force_update=False):
-        """Runs the method of a module"""
-        max_failures = 5
-        if self.module_failures.get(name, 0) >= max_failures:
+        spooled = self._spooled(name)
+        if spooled and not self.mqtt.connected:
+            self.spool.append(topic, pub_data, retain)
             return
-        try:
-            start_time = time.time()
-            if isinstance(method, (dict, list, bool, bytes, int, str, float)):
-                pub_data = method
-            else:
-                if "force_update" in inspect.signature(method).parameters:
-                    pub_data = method(force_update=force_update)
+        expiry = self._message_expiry(name, retain) if lane == "telemetry" else None
+        msg_info = self.mqtt.publish(
+            topic, pub_data, retain, expiry=expiry, qos=self.publish_qos.get(topic)
+        )
+        if "first_sensor" not in self.startup_metrics and self.connect_time:
+            self.startup_metrics["first_sensor"] = round(
+                time.monotonic() - self.connect_time, 3
+            )
+            logger.info(
+                "First sensor data published %.3f seconds after connecting",
+                self.startup_metrics["first_sensor"],
+            )
+        if spooled and msg_info.rc != 0:
+            self.spool.append(topic, pub_data, retain)
+        elif spooled:
+            self.spool_published[topic] = time.time()
+
+    def _spooled(self, name):
+        """Checks if the data of a module are spooled while disconnected"""
+        return self.addon_services.get(name) in self.spool_modules
+
+    def _publish_failed(self, topic, payload, retain):
+        """Spools the data of spooled modules that failed to be published
+        after the transport accepted them"""
+        prefix = f"{self.config['pref_topic']}/monitor_controls/"
+        for name in list(self.addon_services):
+            if self._spooled(name) and topic == prefix + helpers.text_to_topic(name):
+                self.spool.append(topic, payload, retain)
+                return
+
+    def _message_expiry(self, name, retain):
+        """Seconds until the telemetry of a module expires on the broker, the
+        retained state lasts at least two update intervals of its module"""
+        expiry = self.mqtt.message_expiry
+        service = self.addon_services.get(name)
+        addon = self.addons.get(service)
+        if not expiry or not retain or addon is None:
+            return expiry
+        if getattr(addon, "event_driven", False):
+            # Published only when something changes
+            return None
+        return max(expiry, 2 * self.scheduler.module_interval(service, addon))
+
+    def _next_refresh(self, now):
+        """Returns a jittered deadline for republishing an unchanged topic,
+        so that the refreshes of all topics don't happen in the same tick"""
+        jitter = self.update_change_interval * self.update_change_jitter
+        return now + self.update_change_interval + random.uniform(-jitter, jitter)
+
+    def refresh_all(self, spread):
+        """Forces every topic to be republished, spread evenly over some seconds"""
+        topics = list(self.refresh_deadlines)
+        random.shuffle(topics)
+        now = time.monotonic()
+        for num, topic in enumerate(topics):
+            self.refresh_deadlines[topic] = now + spread * num / max(len(topics), 1)
+
+    def _skip_filtered(self, topic, pub_data, publish_filters):
+        """Checks if the value of each filtered entity didn't change more than
+        its deadband and the rest of the data didn't change at all, a publish
+        is always sent after max_silence seconds"""
+        deadbands = {
+            path: publish_filter
+            for path, publish_filter in publish_filters.items()
+            if publish_filter.get("deadband") is not None
+        }
+        if not deadbands or topic not in self.filtered_publish:
+            return False
+        prev_data, prev_time = self.filtered_publish[topic]
+        silence = time.monotonic() - prev_time
+        if any(
+            silence >= publish_filter.get("max_silence", self.update_change_interval)
+            for publish_filter in deadbands.values()
+        ):
+            return False
+        paths = set(deadbands)
+        if without_paths(prev_data, paths) != without_paths(pub_data, paths):
+            return False
+        return all(
+            within_deadband(
+                value_at(prev_data, path),
+                value_at(pub_data, path),
+                publish_filter["deadband"],
+            )
+            for path, publish_filter in deadbands.items()
+        )
+
+    def update_publish_filters(self, service, addon, exposed_controls):
+        """Collects the QoS, deadband and precision options of the exposed
+        controls, user settings under settings.<module>.filters.<entity> take
+        priority"""
+        self._clear_publish_filters(service)
+        settings = (self.config.get("settings") or {}).get(service)
+        user_filters = {}
+        if isinstance(settings, dict) and isinstance(settings.get("filters"), dict):
+            user_filters = settings["filters"]
+        for exp_name, options in exposed_controls.items():
+            publish_filter = {
+                option: options[option]
+                for option in ["deadband", "precision", "max_silence"]
+                if option in options
+            }
+            publish_filter.update(user_filters.get(exp_name) or {})
+            qos = publish_filter.pop("qos", options.get("qos"))
+            if publish_filter or qos is not None:
+                topic = self.mqtt.state_topic(addon, exp_name, options)
+                self.filter_topics.setdefault(service, set()).add(topic)
+            if publish_filter:
+                # Entities that share a topic filter only their own value
+                path = template_path(options.get("value_template"))
+                if path is None:
+                    logger.warning(
+                        "Can't filter %s, its value template is too complex", exp_name
+                    )
                 else:
-                    pub_data = method()
-                diff_time = round(time.time() - start_time, 5)
-                self.inference_times[name] = diff_time
-            self.module_failures[name] = 0
-            self.publ_queue.add_item(name, pub_data, retain, force_update)
-        except Exception as err:
-            self.module_failures[name] = self.module_failures.get(name, 0) + 1
-            if self.module_failures[name] >= max_failures:
-                logger.error(
-                    "Module %s disabled after %d consecutive failures. Last error: %s",
-                    name,
-                    max_failures,
-                    err,
-                )
-            else:
-                logger.error(
-                    "Error with addon %s: %s, %s",
-                    name,
-                    err,
-                    traceback.format_exc(),
-                )
+                    topic_filters = self.publish_filters.setdefault(topic, {})
+                    topic_filters.setdefault(path, {}).update(publish_filter)
+            if qos is not None:
+                # Entities that share a topic get the highest QoS of them
+                self.publish_qos[topic] = max(int(qos), self.publish_qos.get(topic, 0))
+
+    def _clear_publish_filters(self, service):
+        """Removes the publish filters of an addon, returning their topics"""
+        topics = self.filter_topics.pop(service, set())
+        for topic in topics:
+            self.publish_filters.pop(topic, None)
+            self.publish_qos.pop(topic, None)
+        return topics
+
+    def setup_publish_filters(self):
+        """Collects the publish filters of all addons when discovery is disabled"""
+        for service, addon in list(self.addons.items()):
+            if hasattr(addon, "exposed_controls"):
+                try:
+                    self.update_publish_filters(
+                        service, addon, addon.exposed_controls()
+                    )
+                except Exception as err:
+                    logger.error("Could not read controls of %s: %s", service, err)
+
+    # Kept for custom modules, the event sources are now in lnxlink.events
+    def call_method(self, method, *args, **kwargs):
+        """Deprecated, use lnxlink.events.call_method instead"""
+        return self.events.call_method(method, *args, **kwargs)
+
+    def watch_path(self, *args, **kwargs):
+        """Deprecated, use lnxlink.events.watch_path instead"""
+        return self.events.watch_path(*args, **kwargs)
+
+    def unwatch_path(self, wd):
+        """Deprecated, use lnxlink.events.unwatch_path instead"""
+        self.events.unwatch_path(wd)
+
+    # pylint: disable=too-many-arguments
+    def run_module(
+        self, name, method, retain=True, force_update=False, lane="telemetry"
+    ):
+        """Runs the method of a module and queues its data for publishing"""
+        self.scheduler.run_module(name, method, retain, force_update, lane)
+
+    # pylint: disable=too-many-arguments
+    def queue_publish(
+        self, name, pub_data, retain=True, force_update=False, lane="telemetry"
+    ):
+        """Adds the data to the publish queue, which is held while disconnected.
+        The data of spooled modules are written to the spool instead."""
+        if self._spooled(name) and not self.mqtt.connected:
+            self.publish_monitor_data(name, pub_data, retain, force_update, lane)
+            return
+        self.publ_queue.add_item(name, pub_data, retain, force_update, lane)
 
     def run_modules(self, name=None, force_update=False):
         """Runs all methods of the modules"""
         methods_to_run = []
-        for _, addon in self.addons.items():
+        for _, addon in list(self.addons.items()):
             if hasattr(addon, "get_info"):
                 if name is None:
                     methods_to_run.append(
@@ -245,47 +533,99 @@ class LNXlink:
                 force_update=force_update,
             )
 
-    def monitor_run(self):
-        """Gets information from each Addon and adds it to the queue"""
-        while not self.stop_event.is_set():
-            if not self.kill:
-                self.run_modules()
-                if self.stop_event.wait(timeout=self.config["update_interval"]):
-                    break
-            else:
-                if self.stop_event.wait(timeout=0.1):
-                    break
-        logger.info("Stopped monitor_run")
-
     def monitor_queue(self):
-        """Loop through the queue list and publish data to MQTT broker"""
+        """Publish data to MQTT broker as soon as they are added to the queue"""
+        next_publish = time.monotonic()
         while not self.stop_event.is_set():
-            if not self.kill:
-                time.sleep(0.01)
-                for name, queue_data in self.publ_queue:
-                    pub_data, retain, force_publish = queue_data
-                    self.publish_monitor_data(name, pub_data, retain, force_publish)
-                    time.sleep(0.01)
-            if self.stop_event.wait(timeout=0.2):
-                self.mqtt.send_lwt("OFF")
-                break
+            if not self.mqtt.connected_event.wait(timeout=0.2):
+                continue
+            if self.kill or not self.publ_queue.wait(timeout=0.2):
+                if self.kill:
+                    self.stop_event.wait(timeout=0.2)
+                continue
+            for name, queue_data in self.publ_queue:
+                if self.publish_rate > 0:
+                    delay = next_publish - time.monotonic()
+                    if delay > 0 and self.stop_event.wait(timeout=delay):
+                        break
+                    next_publish = max(next_publish, time.monotonic())
+                    next_publish += 1 / self.publish_rate
+                pub_data, retain, force_publish, queued_time, lane = queue_data
+                self.publish_monitor_data(name, pub_data, retain, force_publish, lane)
+                self.publish_latency[name] = round(time.monotonic() - queued_time, 5)
+        self.mqtt.send_lwt("OFF")
         logger.info("Stopped monitor_queue")
 
+    def _replay_spool(self):
+        """Publish the data that were spooled while disconnected"""
+        if self.spool.empty():
+            return
+        replayed = 0
+        topics = set()
+        while self.mqtt.connected and not self.stop_event.is_set():
+            records, position = self.spool.read(50)
+            if not records:
+                break
+            for timestamp, topic, payload, _ in records:
+                if self.spool_published.get(topic, 0) > timestamp:
+                    # Newer data were published since it was spooled
+                    continue
+                # Not retained, so that old data don't replace the current state
+                msg_info = self.mqtt.publish(topic, payload, retain=False)
+                if msg_info.rc != 0:
+                    logger.warning("Stopped replaying spooled data: %s", msg_info.rc)
+                    return
+                topics.add(topic)
+                if self.publish_rate > 0:
+                    self.stop_event.wait(timeout=1 / self.publish_rate)
+            self.spool.commit(position)
+            replayed += len(records)
+        # The current data are published again on the next update
+        for topic in topics:
+            self.refresh_deadlines.pop(topic, None)
+        logger.info("Replayed %s spooled publishes", replayed)
+
     def on_connect(self, client, userdata, flags, rcode, *args):
         """Callback for MQTT connect which reports the connection status
         back to MQTT server"""
         logger.info("MQTT connection: %s", self.mqtt.get_rcode_name(rcode))
+        self.mqtt.set_connected()
         client.subscribe(f"{self.config['pref_topic']}/commands/#")
+        if self.config["mqtt"]["discovery"]["enabled"]:
+            client.subscribe(self.discovery.birth_topic())
         self.mqtt.send_lwt("ON")
+        self.connect_time = time.monotonic()
+        self.startup_metrics = {}
+        threading.Thread(target=self._startup_job, daemon=True).start()
+
+    def _startup_job(self):
+        """Sends discovery and then lets the sensor data to be published,
+        so that the network loop of the MQTT client isn't blocked"""
         if self.config["mqtt"]["discovery"]["enabled"]:
-            self.setup_discovery()
+            self.discovery.setup()
+        else:
+            self.setup_publish_filters()
+        self.startup_metrics["discovery"] = round(
+            time.monotonic() - self.connect_time, 3
+        )
+        self.refresh_all(self.config["update_interval"])
         self.kill = False
+        if self.spool is not None:
+            self._replay_spool()
 
     def disconnect(self, *args):
         """Service has stopped"""
         self.kill = True
+        self.provisioner.remove_listener(self._dependency_installed)
         self.mqtt.disconnect()
         self.stop_event.set()
+        self.discovery.registry.flush()
+        if self.spool is not None:
+            self.spool.close()
+        if self.scheduler.executor is not None:
+            self.scheduler.executor.shutdown(wait=False)
+        self.init_pool.shutdown(wait=False)
+        self.events.stop()
 
     def replace_values_with_none(self, data):
         """Replaces specified values with None recursively"""
@@ -321,10 +661,10 @@ class LNXlink:
                 self.mqtt.client.is_disconnecting = True
             self.mqtt.send_lwt("OFF")
             if self.config["mqtt"]["clear_on_off"]:
-                for topic, message in self.prev_publish.items():
-                    if topic == "last_update":
-                        continue
-                    message = self.replace_values_with_none(message)
+                topic_prefix = f"{self.config['pref_topic']}/monitor_controls/"
+                for topic in list(self.prev_publish):
+                    key = topic[len(topic_prefix) :].replace("/", "_")
+                    message = self.replace_values_with_none(self.saved_publish.get(key))
                     self.mqtt.publish(topic, message)
         else:
             logger.info("Power Up detected.")
@@ -335,6 +675,11 @@ class LNXlink:
     def on_message(self, client, userdata, msg):
         """MQTT message is received with a module command to execute"""
         command_prefix = f"{self.config['pref_topic']}/commands/"
+        if msg.topic == self.discovery.birth_topic():
+            if msg.payload == b"online" and self.config["mqtt"]["discovery"]["enabled"]:
+                logger.info("Home Assistant is online, sending all discovery configs")
+                self.request_discovery(force=True)
+            return
         if not msg.topic.startswith(command_prefix):
             logger.debug("Ignoring MQTT message outside command prefix: %s", msg.topic)
             return
@@ -354,15 +699,23 @@ class LNXlink:
         if addon is not None:
             if hasattr(addon, "start_control"):
                 threading.Thread(
-                    target=self.start_control_bg,
-                    args=(addon, topic, service, message),
+                    target=self._start_control_bg,
+                    args=(addon, topic, service, message, time.monotonic()),
                     daemon=True,
                 ).start()
 
-    def start_control_bg(self, addon, topic, service, message):
+    # pylint: disable=too-many-arguments
+    def _start_control_bg(self, addon, topic, service, message, received_time=None):
         """Starts the start_control method of a module in the background"""
         try:
-            result = addon.start_control(service, message)
+            result = self.events.call_method(addon.start_control, service, message)
+            if received_time is not None and "first_sensor" not in self.startup_metrics:
+                # Commands that finish before the first sensor data are published
+                # measure how responsive LNXlink is while starting up
+                latency = round(time.monotonic() - received_time, 3)
+                self.startup_metrics["command_latency"] = max(
+                    latency, self.startup_metrics.get("command_latency", 0)
+                )
             if result is not None:
                 result_topic = (
                     f"{self.config['pref_topic']}/command_result/{topic.strip('/')}"
@@ -376,46 +729,97 @@ class LNXlink:
                 traceback.format_exc(),
             )
 
-    def setup_discovery(self, filter_name=None):
-        """First time setup of discovery for Home Assistant"""
-        for service, addon in self.addons.items():
-            if filter_name is not None and filter_name != service:
-                continue
-            if hasattr(addon, "exposed_controls"):
-                try:
-                    exposed_controls = addon.exposed_controls()
-                except Exception as err:
-                    logger.error(
-                        "Could not prepare discovery for %s: %s, %s",
-                        service,
-                        err,
-                        traceback.format_exc(),
-                    )
-                    continue
+    def request_discovery(self, name=None, force=False):
+        """Requests discovery for a module, or all modules when the name is None"""
+        self.discovery.request(name, force)
 
-                current_topics = set()
-                discovery_ok = True
-                for exp_name, options in exposed_controls.items():
-                    try:
-                        discovery_topic = self.mqtt.setup_discovery_entities(
-                            addon, service, exp_name, options
-                        )
-                        if discovery_topic is not None:
-                            current_topics.add(discovery_topic)
-                    except Exception as err:
-                        discovery_ok = False
-                        logger.error(
-                            "%s: %s, %s", exp_name, err, traceback.format_exc()
-                        )
-                if discovery_ok:
-                    self.discovery_registry.sync(
-                        service,
-                        current_topics,
-                        getattr(addon, "prune_stale_discovery", False),
-                        self.mqtt,
-                    )
-        if filter_name is None:
-            self.discovery_registry.clear_excluded(self.excluded_modules, self.mqtt)
+    def setup_discovery(self, filter_name=None, force=False):
+        """Deprecated, kept for custom modules, use request_discovery instead"""
+        self.discovery.setup(filter_name, force)
+
+    def reload_config(self):
+        """Reads the configuration again and reloads only the addons whose
+        settings changed, other changes need a restart to take effect"""
+        with self.reload_lock:
+            try:
+                new_config = config_setup.read_config(self.config_path)
+            except Exception as err:
+                logger.error("Could not reload configuration: %s", err)
+                return
+            restart_keys = {
+                key
+                for key in set(self.config) | set(new_config)
+                if key not in RELOADABLE_KEYS | RUNTIME_KEYS
+                and self.config.get(key) != new_config.get(key)
+            }
+            if restart_keys:
+                logger.info(
+                    "Configuration of %s changed", ", ".join(sorted(restart_keys))
+                )
+                self.restart_script()
+                return
+
+            old_settings = self.config.get("settings") or {}
+            new_settings = new_config.get("settings") or {}
+            excluded_modules = self.excluded_modules
+            loaded_modules = self._parse_modules(new_config)
+            services = set(self.loaded_modules) | set(loaded_modules)
+            changed = {
+                service
+                for service in services
+                if service not in self.loaded_modules
+                or service not in loaded_modules
+                or old_settings.get(service) != new_settings.get(service)
+            }
+            # Addons without a disconnect method can't stop their own threads
+            unstoppable = sorted(
+                service
+                for service in changed
+                if service in self.addons
+                and not hasattr(self.addons[service], "disconnect")
+            )
+            if unstoppable:
+                logger.info("Addons %s can't be reloaded", ", ".join(unstoppable))
+                self.restart_script()
+                return
+            for key in RELOADABLE_KEYS:
+                if key in new_config:
+                    self.config[key] = new_config[key]
+                else:
+                    self.config.pop(key, None)
+            self.loaded_modules = loaded_modules
+            if not changed and excluded_modules == self.excluded_modules:
+                logger.debug("Configuration reloaded without addon changes")
+                return
+
+            logger.info("Reloading addons: %s", ", ".join(sorted(changed)))
+            for service in sorted(changed):
+                self._stop_addon(service)
+                if service in loaded_modules:
+                    self._init_addon(loaded_modules[service])
+            # Reloaded addons request their own discovery when they are ready
+            removed = changed - set(loaded_modules)
+            if self.config["mqtt"]["discovery"]["enabled"] and (
+                removed or excluded_modules != self.excluded_modules
+            ):
+                self.request_discovery()
+
+    def _stop_addon(self, service):
+        """Removes a running addon, calling its disconnect method if it has one"""
+        self.pending_addons.pop(service, None)
+        addon = self.addons.pop(service, None)
+        if addon is None:
+            return
+        self.scheduler.unschedule(service)
+        for topic in self._clear_publish_filters(service):
+            self.filtered_publish.pop(topic, None)
+        self.module_failures.pop(addon.name, None)
+        self.addon_services.pop(addon.name, None)
+        if hasattr(addon, "disconnect"):
+            try:
+                self.events.call_method(addon.disconnect)
+            except Exception as err:
+                logger.error("Could not stop addon %s: %s", service, err)
 
     def restart_script(self):
         """Restarts itself"""
@@ -459,6 +863,7 @@ def _run_setup_wizard(args, config_path):
 
 def main():
     """Starts the app with some arguments"""
+    version = helpers.get_install_info()[0]
     description = (
         f"LNXlink {version} bridges this OS with Home Assistant through an MQTT broker."
     )
@@ -540,9 +945,11 @@ def main():
     lnxlink = LNXlink(config)
 
     # Monitor for system changes (Shutdown/Suspend/Sleep)
-    monitor_suspend = MonitorSuspend(lnxlink.temp_connection_callback)
+    monitor_suspend = system_monitor.MonitorSuspend(lnxlink.temp_connection_callback)
     monitor_suspend.start()
-    monitor_gracefulkiller = GracefulKiller(lnxlink.temp_connection_callback)
+    monitor_gracefulkiller = system_monitor.GracefulKiller(
+        lnxlink.temp_connection_callback
+    )
 
     # Starts the main app
     start_status = lnxlink.start(args.exclude)
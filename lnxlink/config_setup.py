@@ -1,6 +1,5 @@
 """Setup the configuration file"""
 
-import copy
 import errno
 import logging
 import os
@@ -11,13 +10,15 @@ import traceback
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
-import beaupy
 import yaml
 
 from lnxlink.consts import CONFIGTEMP, SERVICEHEADLESS, SERVICEUSER
 from lnxlink.modules import get_modules_info
+from lnxlink.modules.scripts import helpers
 
 logger = logging.getLogger("lnxlink")
+# Only the setup wizard uses it
+beaupy = helpers.lazy_import("beaupy")
 
 
 def setup_logger(config_path, log_level):
@@ -219,42 +220,54 @@ def read_config(config_path):
 
 def add_settings(config, name, settings, replace_empty=False):
     """Add missing configuration to yaml file"""
+    missing_keys = missing_settings(config, name, settings, replace_empty)
+    if len(missing_keys) > 0:
+        write_settings(config, missing_keys)
+    return config
+
+
+def missing_settings(config, name, settings, replace_empty=False):
+    """Adds the missing settings of an addon to the config in memory and
+    returns them with replace_empty, so they can be written to the yaml later"""
     if not isinstance(config.get("settings"), dict):
         config["settings"] = {}
-    sys_conf = copy.deepcopy(config)
-    sys_conf["settings"][name] = settings
-    missing_keys = _check_missing(sys_conf, config, [], [], replace_empty)
+    missing_keys = _check_missing(
+        {"settings": {name: settings}}, config, [], [], replace_empty
+    )
+    for keys, value in missing_keys:
+        _add_nested(config, keys, value, replace_empty)
+    return [(keys, value, replace_empty) for keys, value in missing_keys]
 
-    if len(missing_keys) > 0:
-        try:
-            with open(config["config_path"], encoding="utf8") as file:
-                new_config = yaml.load(file, Loader=yaml.FullLoader)
-            for keys, value in missing_keys:
-                new_config = _add_nested(new_config, keys, value, replace_empty)
-                config = _add_nested(config, keys, value, replace_empty)
-                key_path = ".".join(keys)
-                logger.info("Adding missing configuration option: %s", key_path)
-            success_write = _write_config(config["config_path"], new_config)
-            if not success_write:
-                manual_insert = {}
-                for keys, value in missing_keys:
-                    manual_insert = _add_nested(manual_insert, keys, value)
-                manual_yaml = yaml.dump(
-                    manual_insert,
-                    default_flow_style=False,
-                    sort_keys=False,
-                ).rstrip()
-                logger.error(
-                    "Can't write to config file, manual add this: \n%s", manual_yaml
-                )
-
-        except Exception as err:
+
+def write_settings(config, missing_keys):
+    """Writes the missing settings to the yaml file with a single write"""
+    try:
+        with open(config["config_path"], encoding="utf8") as file:
+            new_config = yaml.load(file, Loader=yaml.FullLoader)
+        for keys, value, replace_empty in missing_keys:
+            new_config = _add_nested(new_config, keys, value, replace_empty)
+            key_path = ".".join(keys)
+            logger.info("Adding missing configuration option: %s", key_path)
+        success_write = _write_config(config["config_path"], new_config)
+        if not success_write:
+            manual_insert = {}
+            for keys, value, _ in missing_keys:
+                manual_insert = _add_nested(manual_insert, keys, value)
+            manual_yaml = yaml.dump(
+                manual_insert,
+                default_flow_style=False,
+                sort_keys=False,
+            ).rstrip()
             logger.error(
-                "Couldn't edit configuration (%s): %s",
-                err,
-                traceback.format_exc(),
+                "Can't write to config file, manual add this: \n%s", manual_yaml
             )
-    return config
+
+    except Exception as err:
+        logger.error(
+            "Couldn't edit configuration (%s): %s",
+            err,
+            traceback.format_exc(),
+        )
 
 
 def validate_config(config_path):
@@ -287,9 +300,25 @@ def validate_config(config_path):
 
 def _write_config(config_path, config):
     """Write config changes to disk and report permission issues clearly."""
+    content = yaml.dump(config, default_flow_style=False, sort_keys=False)
+    real_path = os.path.realpath(config_path)
+    temp_path = f"{real_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="UTF-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(real_path):
+            shutil.copymode(real_path, temp_path)
+        os.replace(temp_path, real_path)
+        return True
+    except OSError:
+        # Directory not writable or a bind mounted file, write in place
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
     try:
         with open(config_path, "w", encoding="UTF-8") as file:
-            file.write(yaml.dump(config, default_flow_style=False, sort_keys=False))
+            file.write(content)
         return True
     except OSError as err:
         if err.errno in {errno.EACCES, errno.EPERM, errno.EROFS}:
@@ -39,6 +39,11 @@ mqtt:
   # to try direct MQTT first and fall back to the Home Assistant API.
   transport: "mqtt"
   prefix: 'lnxlink'
+  # Use "5" for MQTT v5, which sends topic aliases, content types and
+  # message_expiry seconds for sensor data, retained data last at least two
+  # update intervals of their module
+  protocol: "3.1.1"
+  message_expiry: 3600
   clientId: 'DESKTOP-Linux'
   server: '192.168.1.1'
   port: 1883
@@ -52,18 +57,58 @@ mqtt:
   discovery:
     enabled: true
     prefix: "homeassistant"
+    # "entity" publishes a config per entity, "device" publishes a single
+    # config with all entities as components of the device
+    mode: "entity"
+    # Discovery configs published per second when publish_rate isn't set,
+    # 0 publishes them without pauses
+    rate: 100
   lwt:
     enabled: true
     qos: 1
   clear_on_off: true
+  # Messages with QoS 1/2 that wait for the broker, and messages queued
+  # behind them, 0 means unlimited
+  max_inflight: 20
+  max_queued: 0
+  # Seconds between reconnection attempts, doubled after each failure
+  reconnect:
+    min_delay: 1
+    max_delay: 60
   homeassistant:
     url: ""
     token: ""
     timeout: 20
     verify_ssl: true
     subscribe_commands: true
+    # Maximum number of publishes sent together over the websocket
+    batch_size: 50
 update_interval: 5
 update_on_change: false
+# Number of threads that collect sensor data concurrently, 0 runs them one
+# after another. Each module gets update_interval seconds, or
+# settings.<module>.timeout, from when a thread picks it up before it is
+# reported as stale. New threads are started if stale modules hold all of them.
+module_workers: 0
+# Seconds to wait for the modules to initialize before starting, slower
+# modules are added when they are ready. A module can have its own deadline
+# with settings.<module>.startup_timeout
+startup_timeout: 10
+# Number of threads that initialize the modules
+init_workers: 8
+# Directory that keeps the wheels of the installed module dependencies, so
+# that they can be installed again without network access
+wheelhouse: ""
+# Maximum number of sensor messages published per second, which also paces
+# discovery and the replay of spooled data. 0 disables the limit
+publish_rate: 0
+# Bytes of large payloads, like camera frames, kept for the RESTful module
+saved_publish_budget: 4194304
+# Modules whose data are kept in a file of this size while disconnected and
+# published when the connection is back
+spool:
+  modules: []
+  size: 1048576
 modules:
 custom_modules:
 exclude:
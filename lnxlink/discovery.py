@@ -0,0 +1,195 @@
+"""Publishes the Home Assistant discovery configs of the addons"""
+
+import logging
+import threading
+import time
+import traceback
+
+from lnxlink.discovery_registry import DiscoveryRegistry
+
+logger = logging.getLogger("lnxlink")
+
+
+class Discovery:
+    """Discovery requests of the addons are coalesced and run by a worker
+    thread, only the configs that changed since they were last published are
+    sent"""
+
+    def __init__(self, lnxlink):
+        self.lnxlink = lnxlink
+        self.registry = DiscoveryRegistry(lnxlink.config)
+        self.requests = {}
+        self.window = 1.0
+        self.condition = threading.Condition()
+
+    def birth_topic(self):
+        """Topic where Home Assistant publishes its status"""
+        return f"{self.lnxlink.config['mqtt']['discovery']['prefix']}/status"
+
+    def request(self, name=None, force=False):
+        """Requests discovery for a module, or all modules when the name is None.
+        Requests within the discovery window are coalesced and run by the
+        discovery worker, so the module that asks for it isn't blocked"""
+        with self.condition:
+            if name in self.requests:
+                deadline, forced = self.requests[name]
+                self.requests[name] = (deadline, forced or force)
+                return
+            deadline = time.monotonic() + self.window
+            self.requests[name] = (deadline, force)
+            self.condition.notify()
+
+    def worker(self):
+        """Runs the requested discoveries when their window has passed"""
+        while not self.lnxlink.stop_event.is_set():
+            with self.condition:
+                if not self.requests:
+                    self.condition.wait(timeout=1)
+                    continue
+                now = time.monotonic()
+                next_deadline = min(deadline for deadline, _ in self.requests.values())
+                if next_deadline > now:
+                    self.condition.wait(timeout=next_deadline - now)
+                    continue
+                due = {
+                    name: force
+                    for name, (deadline, force) in self.requests.items()
+                    if deadline <= now
+                }
+                for name in due:
+                    del self.requests[name]
+            # Discovery of all modules covers the requests of single modules
+            if None in due:
+                due = {None: due[None] or any(due.values())}
+            for name, force in due.items():
+                try:
+                    self.setup(name, force)
+                except Exception as err:
+                    logger.error(
+                        "Discovery of %s failed: %s, %s",
+                        name or "all modules",
+                        err,
+                        traceback.format_exc(),
+                    )
+
+    def setup(self, filter_name=None, force=False):
+        """Setup of discovery for Home Assistant, only the configs that changed
+        since they were last published are sent unless forced"""
+        start_time = time.monotonic()
+        published = self.lnxlink.mqtt.discovery_published
+        mode = self.lnxlink.config["mqtt"]["discovery"].get("mode", "entity")
+        if mode == "device":
+            self.setup_device(force)
+        else:
+            self.setup_entity(filter_name, force)
+        logger.info(
+            "Discovery of %s in %s mode published %s configs in %.3f seconds",
+            filter_name or "all modules",
+            mode,
+            self.lnxlink.mqtt.discovery_published - published,
+            time.monotonic() - start_time,
+        )
+
+    # pylint: disable=too-many-locals
+    def setup_device(self, force=False):
+        """Setup of discovery for Home Assistant with one config for the device"""
+        previous_components, hashes = self.registry.device_entry()
+        if force:
+            hashes = {}
+        components = {}
+        for service, addon in list(self.lnxlink.addons.items()):
+            if not hasattr(addon, "exposed_controls"):
+                continue
+            try:
+                exposed_controls = addon.exposed_controls()
+            except Exception as err:
+                logger.error(
+                    "Could not prepare discovery for %s: %s, %s",
+                    service,
+                    err,
+                    traceback.format_exc(),
+                )
+                continue
+
+            self.lnxlink.update_publish_filters(service, addon, exposed_controls)
+            entity_topics = set()
+            for exp_name, options in exposed_controls.items():
+                try:
+                    # Not a Home Assistant MQTT platform, it can't be a component
+                    if options["type"] == "media_player":
+                        entity_topics.add(
+                            self.lnxlink.mqtt.setup_discovery_entities(
+                                addon, service, exp_name, options
+                            )
+                        )
+                        continue
+                    _, discovery = self.lnxlink.mqtt.discovery_config(
+                        addon, service, exp_name, options
+                    )
+                    if discovery is not None:
+                        discovery.setdefault("platform", options["type"])
+                        components[discovery["unique_id"]] = discovery
+                except Exception as err:
+                    logger.error("%s: %s, %s", exp_name, err, traceback.format_exc())
+            # The per entity configs are replaced by the device config
+            self.registry.clear_service(service, entity_topics, self.lnxlink.mqtt)
+
+        platforms = {
+            unique_id: discovery["platform"]
+            for unique_id, discovery in components.items()
+        }
+        for unique_id, component_platform in previous_components.items():
+            if unique_id not in components:
+                # A component with only its platform is removed by Home Assistant
+                components[unique_id] = {"platform": component_platform}
+        topic = self.lnxlink.mqtt.setup_discovery_device(components, hashes)
+        self.registry.sync_device(topic, platforms, hashes)
+        self.registry.clear_excluded(self.lnxlink.excluded_modules, self.lnxlink.mqtt)
+
+    def setup_entity(self, filter_name=None, force=False):
+        """Setup of discovery for Home Assistant with one config per entity"""
+        if filter_name is None:
+            self.registry.clear_device(self.lnxlink.mqtt)
+        for service, addon in list(self.lnxlink.addons.items()):
+            if filter_name is not None and filter_name != service:
+                continue
+            if hasattr(addon, "exposed_controls"):
+                try:
+                    exposed_controls = addon.exposed_controls()
+                except Exception as err:
+                    logger.error(
+                        "Could not prepare discovery for %s: %s, %s",
+                        service,
+                        err,
+                        traceback.format_exc(),
+                    )
+                    continue
+
+                self.lnxlink.update_publish_filters(service, addon, exposed_controls)
+                hashes = {} if force else self.registry.hashes(service)
+                current_topics = set()
+                discovery_ok = True
+                for exp_name, options in exposed_controls.items():
+                    try:
+                        discovery_topic = self.lnxlink.mqtt.setup_discovery_entities(
+                            addon, service, exp_name, options, hashes
+                        )
+                        if discovery_topic is not None:
+                            current_topics.add(discovery_topic)
+                    except Exception as err:
+                        discovery_ok = False
+                        logger.error(
+                            "%s: %s, %s", exp_name, err, traceback.format_exc()
+                        )
+                if discovery_ok:
+                    self.registry.sync(
+                        service,
+                        current_topics,
+                        getattr(addon, "prune_stale_discovery", False),
+                        self.lnxlink.mqtt,
+                        hashes,
+                    )
+        if filter_name is None:
+            self.registry.clear_excluded(
+                self.lnxlink.excluded_modules, self.lnxlink.mqtt
+            )
@@ -1,6 +1,5 @@
 """Discovery topic registry for Home Assistant integration."""
 
-import copy
 import errno
 import json
 import logging
@@ -9,15 +8,24 @@ import threading
 
 logger = logging.getLogger("lnxlink")
 
+DEVICE_KEY = "_device"
 
+
+# pylint: disable=too-many-instance-attributes
 class DiscoveryRegistry:
-    """Manages Home Assistant discovery topic registration, storage, and cleanup."""
+    """Manages Home Assistant discovery topic registration, storage, and cleanup.
+    The registry in memory is the source of truth, changed services are marked
+    dirty and written to the file once after a short delay."""
 
-    def __init__(self, config):
+    def __init__(self, config, flush_delay=2.0):
         self.config = config
         self.lock = threading.Lock()
-        self.registry = {}
+        self.registry = None
         self.file_enabled = True
+        self.flush_delay = flush_delay
+        self.flush_timer = None
+        self.dirty = set()
+        self.serialized = {}
 
     def registry_path(self):
         """Path of the locally stored Home Assistant discovery topic registry."""
@@ -31,37 +39,77 @@ class DiscoveryRegistry:
         return os.path.join(config_dir, "discovery_registry.json")
 
     def load(self):
-        """Load Home Assistant discovery topics published by this instance."""
+        """Load Home Assistant discovery topics published by this instance once,
+        must be called with the lock held."""
+        if self.registry is not None:
+            return self.registry
+        self.registry = {}
         if not self.file_enabled:
-            return copy.deepcopy(self.registry)
+            return self.registry
         try:
             with open(self.registry_path(), encoding="UTF-8") as registry_file:
                 data = json.load(registry_file)
             if isinstance(data, dict):
                 self.registry = data
-                return copy.deepcopy(data)
         except FileNotFoundError:
             pass
         except Exception as err:
             logger.error("Could not read discovery registry: %s", err)
-        return copy.deepcopy(self.registry)
+        return self.registry
 
-    def save(self, registry):
-        """Persist Home Assistant discovery topics published by this instance."""
-        self.registry = copy.deepcopy(registry)
-        if not self.file_enabled:
-            return
+    def mark_dirty(self, service):
+        """Schedule the registry to be written with the changes of a service,
+        must be called with the lock held."""
+        self.dirty.add(service)
+        if self.flush_timer is None and self.file_enabled:
+            self.flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        """Persist Home Assistant discovery topics published by this instance.
+        Only the dirty services are serialized again and the file is replaced
+        atomically."""
+        with self.lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.dirty or not self.file_enabled or self.registry is None:
+                return
+            for service in self.dirty:
+                if service in self.registry:
+                    entry = json.dumps(self.registry[service], indent=2, sort_keys=True)
+                    self.serialized[service] = entry.replace("\n", "\n  ")
+                else:
+                    self.serialized.pop(service, None)
+            for service in set(self.registry) - set(self.serialized):
+                entry = json.dumps(self.registry[service], indent=2, sort_keys=True)
+                self.serialized[service] = entry.replace("\n", "\n  ")
+            self.dirty.clear()
+            content = ",\n".join(
+                f"  {json.dumps(service)}: {self.serialized[service]}"
+                for service in sorted(self.serialized)
+            )
+            content = f"{{\n{content}\n}}\n" if content else "{}\n"
+            self.write(content)
+
+    def write(self, content):
+        """Write the registry to a temporary file and rename it over the old one."""
+        registry_path = self.registry_path()
+        temp_path = f"{registry_path}.tmp"
         try:
-            with open(self.registry_path(), "w", encoding="UTF-8") as file:
-                json.dump(registry, file, indent=2, sort_keys=True)
-                file.write("\n")
+            with open(temp_path, "w", encoding="UTF-8") as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, registry_path)
         except OSError as err:
             if err.errno in {errno.EACCES, errno.EPERM, errno.EROFS}:
                 self.file_enabled = False
                 logger.warning(
                     "Could not write discovery registry to %s because of permission "
                     "issues. Discovery registry will be stored in memory only.",
-                    self.registry_path(),
+                    registry_path,
                 )
             else:
                 logger.error("Could not write discovery registry: %s", err)
@@ -77,13 +125,61 @@ class DiscoveryRegistry:
             return set(entry.get("topics", [])), set(entry.get("stale_topics", []))
         return set(), set()
 
+    def hashes(self, service):
+        """Content hashes of the discovery configs published for a service."""
+        with self.lock:
+            entry = self.load().get(service, {})
+            if isinstance(entry, dict):
+                return dict(entry.get("hashes", {}))
+        return {}
+
+    def device_entry(self):
+        """Components and hashes of the device discovery config."""
+        with self.lock:
+            entry = self.load().get(DEVICE_KEY, {})
+            return dict(entry.get("components", {})), dict(entry.get("hashes", {}))
+
+    def sync_device(self, topic, components, hashes):
+        """Track the components published with the device discovery config."""
+        entry = {"topic": topic, "components": components, "hashes": hashes}
+        with self.lock:
+            registry = self.load()
+            if registry.get(DEVICE_KEY) != entry:
+                registry[DEVICE_KEY] = entry
+                self.mark_dirty(DEVICE_KEY)
+
+    def clear_device(self, mqtt):
+        """Clear the device discovery config when using per entity configs."""
+        with self.lock:
+            entry = self.load().pop(DEVICE_KEY, None)
+            if entry is None:
+                return
+            if entry.get("topic"):
+                logger.info(
+                    "Clearing Home Assistant discovery topic: %s", entry["topic"]
+                )
+                mqtt.publish(entry["topic"], payload="", retain=True)
+            self.mark_dirty(DEVICE_KEY)
+
+    def clear_service(self, service, keep_topics, mqtt):
+        """Clear the discovery topics of a service, except the ones to keep."""
+        with self.lock:
+            registry = self.load()
+            topics, stale_topics = self.registry_entry(registry, service)
+            topics_to_clear = (topics | stale_topics) - keep_topics
+            for topic in sorted(topics_to_clear):
+                logger.info("Clearing Home Assistant discovery topic: %s", topic)
+                mqtt.publish(topic, payload="", retain=True)
+            if topics_to_clear or service not in registry:
+                registry[service] = {"topics": sorted(keep_topics), "stale_topics": []}
+                self.mark_dirty(service)
+
     def clear_excluded(self, excluded_modules, mqtt):
         """Clear Home Assistant discovery topics for explicitly excluded modules."""
         if not excluded_modules:
             return
         with self.lock:
             registry = self.load()
-            updated = False
             for service in sorted(excluded_modules & set(registry)):
                 topics, stale_topics = self.registry_entry(registry, service)
                 for topic in sorted(topics | stale_topics):
@@ -93,11 +189,10 @@ class DiscoveryRegistry:
                     )
                     mqtt.publish(topic, payload="", retain=True)
                 registry.pop(service, None)
-                updated = True
-            if updated:
-                self.save(registry)
+                self.mark_dirty(service)
 
-    def sync(self, service, current_topics, prune_stale, mqtt):
+    # pylint: disable=too-many-arguments
+    def sync(self, service, current_topics, prune_stale, mqtt, hashes=None):
         """Track discovery topics and clear stale configs for opt-in modules."""
         with self.lock:
             registry = self.load()
@@ -115,8 +210,15 @@ class DiscoveryRegistry:
                 logger.info("Clearing stale Home Assistant discovery topic: %s", topic)
                 mqtt.publish(topic, payload="", retain=True)
 
-            registry[service] = {
+            entry = {
                 "topics": sorted(current_topics | topics_to_mark_stale),
                 "stale_topics": sorted(topics_to_mark_stale),
+                "hashes": {
+                    topic: digest
+                    for topic, digest in (hashes or {}).items()
+                    if topic in current_topics
+                },
             }
-            self.save(registry)
+            if registry.get(service) != entry:
+                registry[service] = entry
+                self.mark_dirty(service)
@@ -0,0 +1,159 @@
+"""Event loop shared by the addons, with inotify, timer and D-Bus sources"""
+
+import asyncio
+import inspect
+import logging
+import os
+import struct
+import threading
+import traceback
+
+import inotify.calls
+import inotify.constants
+from jeepney import DBus
+from jeepney.io.asyncio import Proxy, open_dbus_router
+
+logger = logging.getLogger("lnxlink")
+INOTIFY_HEADER = struct.Struct("iIII")
+
+
+class EventSources:
+    """Runs the event loop that async addons and transports share. Addons
+    register callbacks for file, timer and D-Bus events instead of polling"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.inotify_fd = None
+        self.inotify_watches = {}
+        self.watch_lock = threading.Lock()
+        self.loop_thread = threading.Thread(target=self.run_event_loop, daemon=True)
+        self.loop_thread.start()
+
+    def run_event_loop(self):
+        """Runs the shared event loop until LNXlink stops"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call_method(self, method, *args, **kwargs):
+        """Calls a module method, coroutines are awaited on the shared event loop"""
+        if not inspect.iscoroutinefunction(method):
+            return method(*args, **kwargs)
+        if threading.current_thread() is self.loop_thread:
+            raise RuntimeError(f"Can't wait for {method} inside the event loop")
+        future = asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self.loop)
+        return future.result()
+
+    def run_callback(self, callback, *args):
+        """Runs the callback of an event source and reports its errors"""
+        try:
+            self.call_method(callback, *args)
+        except Exception as err:
+            logger.error(
+                "Error with event callback %s: %s, %s",
+                callback,
+                err,
+                traceback.format_exc(),
+            )
+
+    def add_reader(self, fd, callback, *args):
+        """Calls the callback from the event loop when the fd is readable"""
+        self.loop.call_soon_threadsafe(self.loop.add_reader, fd, callback, *args)
+
+    def remove_reader(self, fd):
+        """Stops watching a file descriptor added by add_reader"""
+        self.loop.call_soon_threadsafe(self.loop.remove_reader, fd)
+
+    def call_every(self, interval, callback, *args):
+        """Calls the callback periodically, cancel the returned future to stop it"""
+        return asyncio.run_coroutine_threadsafe(
+            self._call_every(interval, callback, args), self.loop
+        )
+
+    async def _call_every(self, interval, callback, args):
+        """Timer event source running on the event loop"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.loop.run_in_executor(None, self.run_callback, callback, *args)
+
+    def watch_path(self, path, callback, mask=inotify.constants.IN_ALL_EVENTS):
+        """Calls callback(path, filename, mask) when inotify reports an event"""
+        with self.watch_lock:
+            if self.inotify_fd is None:
+                self.inotify_fd = inotify.calls.inotify_init()
+                os.set_blocking(self.inotify_fd, False)
+                self.add_reader(self.inotify_fd, self._read_inotify)
+            wd = inotify.calls.inotify_add_watch(
+                self.inotify_fd, path.encode("UTF-8"), mask
+            )
+            self.inotify_watches[wd] = (path, callback)
+        return wd
+
+    def unwatch_path(self, wd):
+        """Stops an inotify watch added by watch_path"""
+        with self.watch_lock:
+            if self.inotify_watches.pop(wd, None) is None:
+                return
+            try:
+                inotify.calls.inotify_rm_watch(self.inotify_fd, wd)
+            except Exception as err:
+                logger.debug("Could not remove inotify watch %s: %s", wd, err)
+
+    def _read_inotify(self):
+        """Dispatches the pending inotify events to their callbacks"""
+        try:
+            buffer = os.read(self.inotify_fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + INOTIFY_HEADER.size <= len(buffer):
+            wd, mask, _, length = INOTIFY_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_HEADER.size
+            filename = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+            with self.watch_lock:
+                if mask & inotify.constants.IN_IGNORED:
+                    self.inotify_watches.pop(wd, None)
+                    continue
+                watch = self.inotify_watches.get(wd)
+            if watch is not None:
+                path, callback = watch
+                self.loop.run_in_executor(
+                    None,
+                    self.run_callback,
+                    callback,
+                    path,
+                    filename.decode("UTF-8", errors="replace"),
+                    mask,
+                )
+
+    def watch_dbus(self, match_rule, callback, bus="SESSION"):
+        """Calls callback(message) for each D-Bus message that matches the rule"""
+        return asyncio.run_coroutine_threadsafe(
+            self._watch_dbus(match_rule, callback, bus), self.loop
+        )
+
+    async def _watch_dbus(self, match_rule, callback, bus):
+        """D-Bus signal event source running on the event loop"""
+        try:
+            async with open_dbus_router(bus=bus) as router:
+                await Proxy(DBus(), router).AddMatch(match_rule)
+                with router.filter(match_rule, bufsize=64) as queue:
+                    while True:
+                        message = await queue.get()
+                        await self.loop.run_in_executor(
+                            None, self.run_callback, callback, message
+                        )
+        except Exception as err:
+            logger.error(
+                "Can't watch DBus: %s, %s",
+                err,
+                traceback.format_exc(),
+            )
+
+    def run_coroutine(self, coroutine):
+        """Schedules a coroutine on the event loop and returns its future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        """Stops the event loop"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,409 @@
+"""MQTT transport through the Home Assistant HTTP and WebSocket APIs"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import traceback
+from dataclasses import dataclass
+
+import aiohttp
+import requests
+
+logger = logging.getLogger("lnxlink")
+
+
+@dataclass
+class PublishInfo:
+    """Small paho-compatible publish result for alternate transports."""
+
+    rc: int
+    mid: int
+
+
+@dataclass
+class CommandMessage:
+    """MQTT-like command message passed to the existing on_message handler."""
+
+    topic: str
+    payload: bytes
+
+
+# pylint: disable=too-many-instance-attributes
+class HomeAssistantApiClient:
+    """MQTT client transport via Home Assistant HTTP and WebSocket APIs."""
+
+    def __init__(self, config, loop=None, on_publish_failed=None):
+        self.config = config
+        self.on_publish_failed = on_publish_failed
+        self._publish_mid = 0
+        self._publish_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.is_disconnecting = False
+        self._ws_future = None
+        self._on_message_callback = None
+        self._websocket = None
+        self._outbox = None
+        self._pending = {}
+        self._message_id = 1
+        self.session = requests.Session()
+        self.loop = loop
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def _get_ha_config(self):
+        """Return Home Assistant API transport configuration."""
+        ha_config = self.config["mqtt"].get("homeassistant", {})
+        return {
+            "url": str(ha_config.get("url", "")).rstrip("/"),
+            "token": self._get_token(ha_config),
+            "timeout": float(ha_config.get("timeout", 20)),
+            "verify_ssl": self._config_bool(ha_config.get("verify_ssl", True)),
+            "subscribe_commands": self._config_bool(
+                ha_config.get("subscribe_commands", True)
+            ),
+            "batch_size": int(ha_config.get("batch_size", 50)),
+        }
+
+    def _config_bool(self, value):
+        """Parse boolean config values."""
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return value.lower() in ["1", "true", "yes", "on"]
+        return bool(value)
+
+    def _get_token(self, ha_config):
+        """Read the Home Assistant long-lived access token."""
+        token = str(ha_config.get("token", "")).strip()
+        if not token:
+            return ""
+
+        token_path = os.path.expanduser(token)
+        if os.path.isfile(token_path):
+            try:
+                with open(token_path, encoding="UTF-8") as file:
+                    return file.read().strip()
+            except OSError as err:
+                logger.error("Could not read Home Assistant token file: %s", err)
+                return ""
+
+        return token
+
+    def connect(self, on_connect, on_message, on_disconnect, on_publish):
+        """Connect to Home Assistant API for MQTT publish and commands."""
+        ha_config = self._get_ha_config()
+        if not ha_config["url"] or not ha_config["token"]:
+            logger.error(
+                "Home Assistant MQTT API transport needs mqtt.homeassistant.url "
+                "and token"
+            )
+            return False
+
+        self._on_message_callback = on_message
+        logger.info("Home Assistant MQTT API transport: %s", ha_config["url"])
+        on_connect(self, None, None, 0)
+        self._start_websocket()
+        return True
+
+    # pylint: disable=too-many-arguments
+    def publish(self, topic, payload, qos=1, retain=True, expiry=None):
+        """Publish MQTT message through Home Assistant's mqtt.publish service.
+        Messages are batched over the websocket when it's connected, otherwise
+        they are sent with an HTTP request"""
+        if payload is None:
+            payload = ""
+        elif isinstance(payload, bytes):
+            payload = payload.decode("UTF-8")
+        elif not isinstance(payload, str):
+            payload = str(payload)
+        service_data = {
+            "topic": topic,
+            "payload": payload,
+            "qos": qos,
+            "retain": retain,
+        }
+
+        if self._websocket is not None and not self.is_disconnecting:
+            self.loop.call_soon_threadsafe(self._enqueue_publish, service_data)
+            rc = 0
+        else:
+            rc = self._post_publish(service_data)
+
+        with self._publish_lock:
+            self._publish_mid += 1
+            mid = self._publish_mid
+
+        logger.debug("Message RC Code: %s, MQTT Number: %s", rc, mid)
+        return PublishInfo(rc=rc, mid=mid)
+
+    def _post_publish(self, service_data):
+        """Publish a message with a blocking HTTP request"""
+        ha_config = self._get_ha_config()
+        timeout = 2.0 if self.is_disconnecting else ha_config["timeout"]
+        try:
+            response = self.session.post(
+                f"{ha_config['url']}/api/services/mqtt/publish",
+                headers={
+                    "Authorization": f"Bearer {ha_config['token']}",
+                    "Content-Type": "application/json",
+                },
+                json=service_data,
+                timeout=timeout,
+                verify=ha_config["verify_ssl"],
+            )
+            response.raise_for_status()
+            return 0
+        except Exception as err:
+            logger.error("Home Assistant MQTT publish failed: %s", err)
+            logger.debug(traceback.format_exc())
+            return 1
+
+    def _post_fallback(self, service_data):
+        """Publish a message that the websocket couldn't deliver with an HTTP
+        request, reporting it as failed if that doesn't work either"""
+        if self._post_publish(service_data) != 0 and self.on_publish_failed:
+            self.on_publish_failed(
+                service_data["topic"], service_data["payload"], service_data["retain"]
+            )
+
+    def _enqueue_publish(self, service_data):
+        """Queue a publish for the websocket, runs on the event loop"""
+        if self._outbox is None:
+            self.loop.run_in_executor(None, self._post_fallback, service_data)
+            return
+        self._outbox.put_nowait(service_data)
+
+    def _flush_pending(self):
+        """Wait until the queued websocket publishes are acknowledged"""
+        if self._outbox is None or self._ws_future is None or self._ws_future.done():
+            return
+
+        async def wait_outbox():
+            if self._outbox is not None:
+                await self._outbox.join()
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(wait_outbox(), self.loop)
+            future.result(timeout=2)
+        except Exception:
+            pass
+
+    def reconnect(self):
+        """Reconnect to Home Assistant MQTT WebSocket."""
+        logger.info("Reconnecting to Home Assistant MQTT websocket")
+        self._flush_pending()
+        self._stop_event.set()
+        self._wait_websocket(timeout=2)
+        self._start_websocket()
+
+    def disconnect(self):
+        """Disconnect from Home Assistant API."""
+        self._flush_pending()
+        self.is_disconnecting = True
+        self._stop_event.set()
+        self._wait_websocket(timeout=2)
+        try:
+            self.session.close()
+        except Exception:
+            pass
+        logger.info("Disconnected from Home Assistant MQTT API.")
+
+    def subscribe(self, topic):
+        """Subscriptions are owned by the websocket bridge."""
+        logger.debug("Home Assistant websocket subscribes to %s", topic)
+
+    def _start_websocket(self):
+        """Start the Home Assistant websocket MQTT subscription on the event loop."""
+        if self._ws_future is not None and not self._ws_future.done():
+            return
+        self._stop_event.clear()
+        self._ws_future = asyncio.run_coroutine_threadsafe(
+            self._run_websocket(), self.loop
+        )
+
+    def _wait_websocket(self, timeout):
+        """Wait for the websocket bridge to stop after the stop event is set."""
+        if self._ws_future is None or self._ws_future.done():
+            return
+        try:
+            self._ws_future.result(timeout=timeout)
+        except Exception:
+            pass
+
+    async def _run_websocket(self):
+        """Run the Home Assistant websocket bridge on the shared event loop."""
+        try:
+            await self._websocket_loop()
+        except Exception as err:
+            logger.error("Home Assistant MQTT websocket failed: %s", err)
+            logger.debug(traceback.format_exc())
+
+    async def _websocket_loop(self):
+        """Subscribe to command topics through Home Assistant websocket."""
+        ha_config = self._get_ha_config()
+        command_topic = f"{self.config['pref_topic']}/commands/#"
+        while not self._stop_event.is_set():
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(
+                        f"{ha_config['url']}/api/websocket",
+                        heartbeat=30,
+                        ssl=ha_config["verify_ssl"],
+                    ) as websocket:
+                        auth_required = await websocket.receive_json()
+                        if auth_required.get("type") != "auth_required":
+                            raise RuntimeError(
+                                f"Unexpected Home Assistant websocket hello: {auth_required}"
+                            )
+                        await websocket.send_json(
+                            {
+                                "type": "auth",
+                                "access_token": ha_config["token"],
+                            }
+                        )
+                        auth_result = await websocket.receive_json()
+                        if auth_result.get("type") != "auth_ok":
+                            raise RuntimeError(
+                                f"Home Assistant websocket auth failed: {auth_result}"
+                            )
+                        if ha_config["subscribe_commands"]:
+                            await websocket.send_json(
+                                {
+                                    "id": 1,
+                                    "type": "mqtt/subscribe",
+                                    "topic": command_topic,
+                                }
+                            )
+                            subscribe_result = await websocket.receive_json()
+                            if not subscribe_result.get("success"):
+                                raise RuntimeError(
+                                    "Home Assistant MQTT subscribe failed: "
+                                    f"{subscribe_result}"
+                                )
+                            logger.info(
+                                "Subscribed to MQTT commands through "
+                                "Home Assistant API: %s",
+                                command_topic,
+                            )
+                        await self._serve_websocket(websocket, ha_config)
+            except Exception as err:
+                if not self._stop_event.is_set():
+                    logger.error("Home Assistant MQTT websocket disconnected: %s", err)
+                    logger.debug(traceback.format_exc())
+                    await asyncio.sleep(5)
+
+    async def _serve_websocket(self, websocket, ha_config):
+        """Send the queued publishes while receiving commands and acknowledgements"""
+        self._outbox = asyncio.Queue()
+        self._websocket = websocket
+        flusher = asyncio.ensure_future(self._send_publishes(websocket, ha_config))
+        try:
+            await self._receive_messages(websocket)
+        finally:
+            self._websocket = None
+            flusher.cancel()
+            outbox, self._outbox = self._outbox, None
+            unsent = [
+                service_data
+                for waiter, service_data in self._pending.values()
+                if not self._published(waiter)
+            ]
+            self._pending.clear()
+            while not outbox.empty():
+                unsent.append(outbox.get_nowait())
+            for service_data in unsent:
+                self.loop.run_in_executor(None, self._post_fallback, service_data)
+
+    async def _send_publishes(self, websocket, ha_config):
+        """Send the queued publishes in batches of pipelined service calls"""
+        outbox = self._outbox
+        while True:
+            batch = [await outbox.get()]
+            while len(batch) < ha_config["batch_size"] and not outbox.empty():
+                batch.append(outbox.get_nowait())
+            # Registered before sending, so that a closed websocket falls back
+            # to HTTP for the whole batch
+            waiters = {}
+            for service_data in batch:
+                self._message_id += 1
+                waiters[self._message_id] = self.loop.create_future()
+                self._pending[self._message_id] = (
+                    waiters[self._message_id],
+                    service_data,
+                )
+            for message_id, service_data in zip(waiters, batch):
+                await websocket.send_json(
+                    {
+                        "id": message_id,
+                        "type": "call_service",
+                        "domain": "mqtt",
+                        "service": "publish",
+                        "service_data": service_data,
+                    }
+                )
+            await asyncio.wait(waiters.values(), timeout=ha_config["timeout"])
+            failed = [
+                service_data
+                for waiter, service_data in map(self._pending.pop, waiters)
+                if not self._published(waiter)
+            ]
+            if failed:
+                logger.error(
+                    "Home Assistant MQTT publish failed for %s messages, "
+                    "sending them with HTTP requests",
+                    len(failed),
+                )
+            for service_data in failed:
+                self.loop.run_in_executor(None, self._post_fallback, service_data)
+            for _ in batch:
+                outbox.task_done()
+
+    def _published(self, waiter):
+        """Checks if Home Assistant acknowledged a publish successfully"""
+        return waiter.done() and waiter.result().get("success")
+
+    async def _receive_messages(self, websocket):
+        """Forward Home Assistant websocket MQTT events to the command handler
+        and match the results of the service calls by their id."""
+        while not self._stop_event.is_set():
+            try:
+                message = await websocket.receive(timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if message.type == aiohttp.WSMsgType.TEXT:
+                data = json.loads(message.data)
+                if data.get("type") == "result":
+                    waiter, service_data = self._pending.get(
+                        data.get("id"), (None, None)
+                    )
+                    if waiter is None:
+                        continue
+                    if not data.get("success"):
+                        logger.error(
+                            "Home Assistant MQTT publish failed for %s: %s",
+                            service_data["topic"],
+                            data.get("error"),
+                        )
+                    if not waiter.done():
+                        waiter.set_result(data)
+                    continue
+                event = data.get("event", {})
+                topic = event.get("topic")
+                payload = event.get("payload", "")
+                if topic and self._on_message_callback is not None:
+                    if not isinstance(payload, str):
+                        payload = json.dumps(payload)
+                    self._on_message_callback(
+                        self,
+                        None,
+                        CommandMessage(topic=topic, payload=payload.encode("UTF-8")),
+                    )
+            elif message.type in (
+                aiohttp.WSMsgType.CLOSED,
+                aiohttp.WSMsgType.CLOSE,
+                aiohttp.WSMsgType.ERROR,
+            ):
+                raise RuntimeError(f"websocket closed: {message.type}")
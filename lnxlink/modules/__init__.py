@@ -6,8 +6,6 @@ import time
 from importlib import import_module
 from importlib.util import module_from_spec, spec_from_file_location
 
-import requests
-
 logger = logging.getLogger("lnxlink")
 
 
@@ -42,6 +40,9 @@ def parse_modules(list_modules=None, custom_modules=None, exclude=None):
                 if module_name.endswith(".py"):
                     if module_name.startswith("http"):
                         logger.info("Downloading custom module: %s", module_name)
+                        # pylint: disable=import-outside-toplevel
+                        import requests
+
                         module_data = requests.get(module_name, timeout=3).content
                         module_basename = os.path.basename(module_name)
                         module_name = f"/tmp/{module_basename}"
@@ -49,7 +49,7 @@ class Addon:
             devices[device_name]["percent"] = None
         self.devices = devices
         if len(new_devices) > 0:
-            self.lnxlink.setup_discovery("battery")
+            self.lnxlink.request_discovery("battery")
 
         return devices
 
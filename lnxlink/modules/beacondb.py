@@ -2,7 +2,6 @@
 import csv
 import io
 import logging
-import time
 from shutil import which
 
 import requests
@@ -70,35 +69,31 @@ class Addon:
         """Setup addon"""
         self.name = "BeaconDB"
         self.lnxlink = lnxlink
-        self.last_time = 0
         self.update_interval = 360  # Check for position every 6 minutes
         self.position = None
         if which("nmcli") is None:
             raise SystemError("System command 'nmcli' not found")
         self.lnxlink.add_settings("beacondb", {"wifi_positions": []})
 
-    def get_info(self, force_update=False):
+    def get_info(self):
         """Gather information from the system"""
-        cur_time = time.time()
-        if force_update or cur_time - self.last_time > self.update_interval:
-            self.last_time = cur_time
-            wifi_data = scan_wifi_nmcli()
-            use_localconfig = False
-            for config in self.lnxlink.config["settings"]["beacondb"]["wifi_positions"]:
-                if any(data["ssid"] == config.get("ssid") for data in wifi_data):
-                    use_localconfig = True
-                    self.position = {
-                        "latitude": config.get("latitude"),
-                        "longitude": config.get("longitude"),
-                        "gps_accuracy": config.get("accuracy", 200),
-                    }
-            location_result = get_location_from_beacondb(wifi_data, consider_ip=True)
-            if location_result and not use_localconfig:
+        wifi_data = scan_wifi_nmcli()
+        use_localconfig = False
+        for config in self.lnxlink.config["settings"]["beacondb"]["wifi_positions"]:
+            if any(data["ssid"] == config.get("ssid") for data in wifi_data):
+                use_localconfig = True
                 self.position = {
-                    "latitude": location_result.get("location", {}).get("lat"),
-                    "longitude": location_result.get("location", {}).get("lng"),
-                    "gps_accuracy": location_result.get("accuracy"),
+                    "latitude": config.get("latitude"),
+                    "longitude": config.get("longitude"),
+                    "gps_accuracy": config.get("accuracy", 200),
                 }
+        location_result = get_location_from_beacondb(wifi_data, consider_ip=True)
+        if location_result and not use_localconfig:
+            self.position = {
+                "latitude": location_result.get("location", {}).get("lat"),
+                "longitude": location_result.get("location", {}).get("lng"),
+                "gps_accuracy": location_result.get("accuracy"),
+            }
         return self.position
 
     def exposed_controls(self):
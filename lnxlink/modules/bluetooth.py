@@ -115,7 +115,7 @@ class Addon:
         # Trigger discovery for newly loaded devices
         if loaded:
             logger.info("New devices detected: %s", loaded)
-            self.lnxlink.setup_discovery("bluetooth")
+            self.lnxlink.request_discovery("bluetooth")
 
         return self.bluetoothdata
 
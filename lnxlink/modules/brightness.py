@@ -27,7 +27,7 @@ class Addon:
                     "Detected change in connected monitors, updating discovery."
                 )
                 self.monitors = monitors
-                self.lnxlink.setup_discovery("brightness")
+                self.lnxlink.request_discovery("brightness")
 
         info = {}
         for monitor in self.monitors:
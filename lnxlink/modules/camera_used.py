@@ -1,9 +1,15 @@
 """Track webcam activity for privacy or presence automations"""
 
 import glob
-from threading import Thread
+import threading
 
-from inotify.adapters import Inotify
+from inotify.constants import (
+    IN_CLOSE_NOWRITE,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_OPEN,
+)
 
 from lnxlink.modules.scripts.helpers import syscommand
 
@@ -15,27 +21,48 @@ class Addon:
         """Setup addon"""
         self.name = "Camera used"
         self.lnxlink = lnxlink
-        self.inotify = Inotify()
+        self.event_driven = True
         self.cameras = []
         self.cam_used = False
-        Thread(target=self._watch_events, daemon=True).start()
+        # The inotify callbacks call get_info from several threads
+        self.lock = threading.Lock()
+        self.watches = {}
+        self.watches["/dev"] = self.lnxlink.events.watch_path(
+            "/dev", self._devices_changed, IN_CREATE | IN_DELETE
+        )
 
     def get_info(self):
         """Gather information from the system"""
-        cameras = glob.glob("/dev/video*", recursive=True)
-        if cameras != self.cameras:
-            self.cameras = cameras
-            for camera in cameras:
-                self.inotify.add_watch(camera)
+        with self.lock:
+            cameras = glob.glob("/dev/video*", recursive=True)
+            if cameras != self.cameras:
+                for camera in set(self.cameras) - set(cameras):
+                    # Removed by inotify together with the device
+                    self.watches.pop(camera, None)
+                for camera in set(cameras) - set(self.cameras):
+                    self.watches[camera] = self.lnxlink.events.watch_path(
+                        camera,
+                        self._camera_changed,
+                        IN_OPEN | IN_CLOSE_WRITE | IN_CLOSE_NOWRITE,
+                    )
+                self.cameras = cameras
             _, _, returncode = syscommand("fuser /dev/video*", ignore_errors=True)
             self.cam_used = returncode == 0
-        return self.cam_used
+            return self.cam_used
 
-    def _watch_events(self):
-        for _ in self.inotify.event_gen(yield_nones=False):
-            _, _, returncode = syscommand("fuser /dev/video*", ignore_errors=True)
-            self.cam_used = returncode == 0
-            self.lnxlink.run_module(self.name, self.cam_used)
+    def _devices_changed(self, path, filename, mask):
+        if filename.startswith("video"):
+            self.lnxlink.run_module(self.name, self.get_info, lane="event")
+
+    def _camera_changed(self, path, filename, mask):
+        self.lnxlink.run_module(self.name, self.get_info, lane="event")
+
+    def disconnect(self):
+        """Stops watching the cameras"""
+        with self.lock:
+            for wd in self.watches.values():
+                self.lnxlink.events.unwatch_path(wd)
+            self.watches = {}
 
     def exposed_controls(self):
         """Exposes to home assistant"""
@@ -13,6 +13,7 @@ class Addon:
         self.lnxlink = lnxlink
         self.cpuinfo = self._cpuinfo()
         self.cores = psutil.cpu_count() or 1
+        self.lnxlink.sampler.sample("cpu")
 
     def get_info(self):
         """Gather information from the system"""
@@ -21,7 +22,7 @@ class Addon:
         load_percent = round((load[0] / self.cores) * 100, 1)
 
         return {
-            "percent": psutil.cpu_percent(),
+            "percent": self._cpu_percent(),
             "load": load[0],
             "load_percent": load_percent,
             "attributes": {
@@ -58,6 +59,21 @@ class Addon:
             },
         }
 
+    def _cpu_percent(self):
+        """Calculates the CPU usage since the previous sample"""
+        previous, current = self.lnxlink.sampler.sample("cpu")
+        if previous is None:
+            return 0.0
+        times = {
+            key: value - previous.data.get(key, 0)
+            for key, value in current.data.items()
+        }
+        total = sum(times.values())
+        if total <= 0:
+            return 0.0
+        busy = total - times["idle"] - times.get("iowait", 0)
+        return round(max(busy, 0) / total * 100, 1)
+
     def _cpuinfo(self):
         cmd = (
             "cat /proc/cpuinfo | grep -i 'model name' | uniq | awk -F ':' '{print $2}'"
@@ -1,7 +1,5 @@
 """Measure read/write throughput for each physical disk"""
-import asyncio
 import glob
-from timeit import default_timer as timer
 
 
 class Addon:
@@ -39,6 +37,7 @@ class Addon:
             "flush IOs",
             "flush ticks",
         ]
+        self.lnxlink.sampler.sample("disks")
 
     def exposed_controls(self):
         """Exposes to home assistant"""
@@ -59,22 +58,11 @@ class Addon:
         disks = self._get_disks()
         if self.disks != disks:
             self.disks = disks
-            self.lnxlink.setup_discovery("disk_io")
-        loop = asyncio.new_event_loop()
-        try:
-            results = loop.run_until_complete(self._get_info_async())
-        finally:
-            loop.close()
-        return results
-
-    async def _get_info_async(self):
-        features = []
-        for disk in self.disks:
-            features.append(self._run_check(disk))
-        gathers = await asyncio.gather(*features)
+            self.lnxlink.request_discovery("disk_io")
+        previous, current = self.lnxlink.sampler.sample("disks")
         results = {}
-        for disk, utilization in gathers:
-            results[disk] = utilization
+        for disk in self.disks:
+            results[disk] = self._utilization(disk, previous, current)
         return results
 
     def _get_disks(self):
@@ -108,19 +96,17 @@ class Addon:
             disks.append(disk_name)
         return disks
 
-    async def _run_check(self, disk):
-        with open(f"/sys/block/{disk}/stat", encoding="UTF-8") as file:
-            pout1 = file.read()
-        start = timer()
-        await asyncio.sleep(0.1)
-        with open(f"/sys/block/{disk}/stat", encoding="UTF-8") as file:
-            pout2 = file.read()
-        totaltime = timer() - start
-
-        stats1 = dict(zip(self.stat_items, map(int, pout1.split())))
-        stats2 = dict(zip(self.stat_items, map(int, pout2.split())))
+    def _utilization(self, disk, previous, current):
+        """Percentage of time the disk was busy between two samples"""
+        if previous is None or disk not in previous.data or disk not in current.data:
+            return 0
+        totaltime = current.time - previous.time
+        if totaltime <= 0:
+            return 0
+        stats1 = dict(zip(self.stat_items, previous.data[disk]))
+        stats2 = dict(zip(self.stat_items, current.data[disk]))
 
         utilization = (stats2["io_ticks"] - stats1["io_ticks"]) / totaltime / 10
         utilization = min(utilization, 100)
         utilization = int(round(utilization, 0))
-        return disk, utilization
+        return utilization
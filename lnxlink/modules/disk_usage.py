@@ -53,7 +53,7 @@ class Addon:
             self.disks[disk_name]["percent"] = None
         self.disks = disks
         if len(mounted) > 0:
-            self.lnxlink.setup_discovery("disk_usage")
+            self.lnxlink.request_discovery("disk_usage")
         return self.disks
 
     def _bytetogb(self, byte):
@@ -33,6 +33,7 @@ class Addon:
             raise SystemError("Docker package not found")
 
         self.client = self._get_client()
+        self.update_status = DockerUpdateStatus()
         self.prev_update = 0
         self.images_remoteinfo = []
         self.updating_containers = set()
@@ -100,10 +101,15 @@ class Addon:
         """Gather information from the system"""
         containers = self._get_containers(force_update=force_update)
         if len(containers) != len(self.containers):
-            self.lnxlink.setup_discovery("docker")
+            self.lnxlink.request_discovery("docker")
         self.containers = containers
         return self.containers
 
+    def disconnect(self):
+        """Closes the connections to Docker and the registries"""
+        self.lnxlink.events.call_method(self.update_status.close)
+        self.client.close()
+
     # pylint: disable=too-many-locals
     def _get_containers(self, force_update=False):
         include = self.lnxlink.config["settings"].get("docker", {}).get("include", [])
@@ -124,8 +130,9 @@ class Addon:
         if check_update is not None:
             if force_update or cur_time - self.prev_update > check_update:
                 self.prev_update = cur_time
-                docker_update_status = DockerUpdateStatus()
-                self.images_remoteinfo = docker_update_status.get_updates_sync(images)
+                self.images_remoteinfo = self.lnxlink.events.call_method(
+                    self.update_status.get_updates, images
+                )
 
             for remoteimage_info in self.images_remoteinfo:
                 for container_id, container in containers.items():
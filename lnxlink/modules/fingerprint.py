@@ -198,7 +198,7 @@ class Addon:
             if action
             else self.fingerprint.state()
         )
-        self.lnxlink.run_module(self.name, payload)
+        self.lnxlink.run_module(self.name, payload, lane="event")
 
     def found_finger(self, finger_id, confidence):
         """Handle a successful fingerprint authorization callback."""
@@ -221,7 +221,7 @@ class Addon:
         payload = self.fingerprint.event_payload("error")
         payload["stage"] = stage
         payload["error"] = str(err)
-        self.lnxlink.run_module(self.name, payload)
+        self.lnxlink.run_module(self.name, payload, lane="event")
 
     @staticmethod
     def _is_raspberry():
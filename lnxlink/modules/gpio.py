@@ -95,6 +95,7 @@ class Addon:
         self.name = "gpio"
         self.lnxlink = lnxlink
         self.gpio_results = {}
+        self.event_driven = True
         self.started = False
         self.handles = {}
 
@@ -146,7 +147,7 @@ class Addon:
         )
         filter_gpio = filter_input_gpio + filter_output_gpio
         self.gpio_results[f"{pintype}_{filter_gpio[0]['name']}"] = value
-        self.lnxlink.run_module(self.name, self.gpio_results)
+        self.lnxlink.run_module(self.name, dict(self.gpio_results), lane="event")
 
     def _is_raspberry(self):
         model = ""
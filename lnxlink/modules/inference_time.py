@@ -11,14 +11,17 @@ class Addon:
 
     def get_info(self):
         """Gather information from the system"""
+        # The module threads add their times while this runs
+        inference_times = dict(self.lnxlink.inference_times)
         return {
-            "modules": self.lnxlink.inference_times,
-            "sum": round(sum(self.lnxlink.inference_times.values()), 2),
-            "max": max(
-                self.lnxlink.inference_times,
-                key=self.lnxlink.inference_times.get,
-                default=None,
-            ),
+            "modules": inference_times,
+            "sum": round(sum(inference_times.values()), 2),
+            "max": max(inference_times, key=inference_times.get, default=None),
+            "stale": sorted(self.lnxlink.stale_modules),
+            "publish_latency": max(self.lnxlink.publish_latency.values(), default=0),
+            "queue_drops": self.lnxlink.publ_queue.drops,
+            "mqtt": self.lnxlink.mqtt.diagnostics,
+            "startup": self.lnxlink.startup_metrics,
         }
 
     def exposed_controls(self):
@@ -40,4 +43,13 @@ class Addon:
                 "value_template": "{{ value_json.max }}",
                 "enabled": False,
             },
+            "MQTT Reconnect Attempts": {
+                "type": "sensor",
+                "icon": "mdi:lan-pending",
+                "entity_category": "diagnostic",
+                "state_class": "total_increasing",
+                "value_template": "{{ value_json.mqtt.attempts }}",
+                "attributes_template": "{{ value_json.mqtt | tojson }}",
+                "enabled": False,
+            },
         }
@@ -46,7 +46,7 @@ class Addon:
             interfaces[interface] = self.interfaces[interface]
         self.interfaces = interfaces
         if len(loaded) > 0:
-            self.lnxlink.setup_discovery("interfaces")
+            self.lnxlink.request_discovery("interfaces")
         return self.interfaces
 
     def _bytetogb(self, byte):
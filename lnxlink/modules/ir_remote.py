@@ -127,8 +127,10 @@ class Addon:
             "decsignal": decsignal,
             "protocol": protocol,
         }
-        self.lnxlink.run_module(f"{self.name}/IR Receiver", tosend)
-        self.lnxlink.run_module(f"{self.name}/IR Receiver Event", tosend, retain=False)
+        self.lnxlink.run_module(f"{self.name}/IR Receiver", tosend, lane="event")
+        self.lnxlink.run_module(
+            f"{self.name}/IR Receiver Event", tosend, retain=False, lane="event"
+        )
         logger.debug("{%s}:{%s} = {%s}", protocol, decsignal, binsignal)
 
     def _requirements(self):
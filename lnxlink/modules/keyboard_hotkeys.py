@@ -74,4 +74,4 @@ class Addon:
                 "key": key,
             },
         }
-        self.lnxlink.run_module(self.name, data_send)
+        self.lnxlink.run_module(self.name, data_send, lane="event")
@@ -1,5 +1,4 @@
 """Track memory usage and availability"""
-import psutil
 
 
 class Addon:
@@ -8,6 +7,7 @@ class Addon:
     def __init__(self, lnxlink):
         """Setup addon"""
         self.name = "Memory Usage"
+        self.lnxlink = lnxlink
 
     def exposed_controls(self):
         """Exposes to home assistant"""
@@ -41,9 +41,17 @@ class Addon:
 
     def get_info(self):
         """Gather information from the system"""
-        vmem = psutil.virtual_memory()
+        meminfo = self.lnxlink.sampler.get("memory")
+        total = meminfo["MemTotal"]
+        free = meminfo["MemFree"]
+        cached = meminfo.get("Cached", 0) + meminfo.get("SReclaimable", 0)
+        used = total - free - meminfo.get("Buffers", 0) - cached
+        if used < 0:
+            used = total - free
+        available = meminfo.get("MemAvailable", free)
+        percent = (total - available) / total * 100 if total else 0
         return {
-            "percent": round(vmem.percent, 0),
-            "used": round(vmem.used / 1024**2, 0),
-            "available": round(vmem.available / 1024**2, 0),
+            "percent": round(percent, 0),
+            "used": round(used / 1024**2, 0),
+            "available": round(available / 1024**2, 0),
         }
@@ -15,6 +15,7 @@ class Addon:
         """Setup addon"""
         self.name = "Mounts"
         self.lnxlink = lnxlink
+        self.update_interval = 60  # Calculating remote mount sizes is slow
         self.lib = {}
         self.lnxlink.add_settings(
             "mounts",
@@ -53,7 +54,7 @@ class Addon:
             self.mounts[mount_name]["percent"] = None
         self.mounts = mounts
         if len(mounted) > 0:
-            self.lnxlink.setup_discovery("mounts")
+            self.lnxlink.request_discovery("mounts")
         return self.mounts
 
     def _get_mounts(self):
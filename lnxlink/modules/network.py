@@ -1,7 +1,4 @@
 """Monitor real-time upload and download speeds"""
-from datetime import datetime
-
-import psutil
 
 
 class Addon:
@@ -10,9 +7,8 @@ class Addon:
     def __init__(self, lnxlink):
         """Setup addon"""
         self.name = "Network"
-        self.time_old = datetime.now()
-        self.recv_old = psutil.net_io_counters().bytes_recv
-        self.sent_old = psutil.net_io_counters().bytes_sent
+        self.lnxlink = lnxlink
+        self.lnxlink.sampler.sample("network")
 
     def exposed_controls(self):
         """Exposes to home assistant"""
@@ -37,18 +33,12 @@ class Addon:
 
     def get_info(self):
         """Returns Mbps"""
-        time_new = datetime.now()
-        netio = psutil.net_io_counters()
-        recv_new = netio.bytes_recv
-        sent_new = netio.bytes_sent
-
-        time_diff = (time_new - self.time_old).total_seconds()
-        self.time_old = time_new
-
-        recv_diff = recv_new - self.recv_old
-        sent_diff = sent_new - self.sent_old
-        self.recv_old = recv_new
-        self.sent_old = sent_new
+        previous, current = self.lnxlink.sampler.sample("network")
+        if previous is None:
+            return {"upload": 0, "download": 0}
+        time_diff = current.time - previous.time
+        recv_diff = current.data["bytes_recv"] - previous.data["bytes_recv"]
+        sent_diff = current.data["bytes_sent"] - previous.data["bytes_sent"]
 
         if time_diff == 0:
             return {"upload": 0, "download": 0}
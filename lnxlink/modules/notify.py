@@ -107,10 +107,12 @@ class Addon:
                 uniqueid=data.get("uniqueid", None),
             )
             logger.info("The notification %s was sent.", notification_id)
-            self.lnxlink.run_module(self.name, {"id": notification_id})
+            self.lnxlink.run_module(self.name, {"id": notification_id}, lane="event")
 
     def callback_action(self, notification_type, notification):
         """Gather notification options and send to the MQTT broker"""
         if notification_type == "button":
             logger.info("Pressed notification button: %s", notification)
-            self.lnxlink.run_module(f"{self.name}/button_press", notification, False)
+            self.lnxlink.run_module(
+                f"{self.name}/button_press", notification, False, lane="event"
+            )
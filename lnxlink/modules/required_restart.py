@@ -1,7 +1,6 @@
 """Detect if a system reboot is needed"""
 import logging
 import os
-import time
 from shutil import which
 
 from lnxlink.modules.scripts.helpers import syscommand
@@ -15,7 +14,6 @@ class Addon:
     def __init__(self, lnxlink):
         """Setup addon"""
         self.name = "Required Restart"
-        self.last_time = 0
         self.update_interval = 360  # Check for updates every 6 minutes
         self.value = {
             "needs_restart": "OFF",
@@ -60,31 +58,25 @@ class Addon:
             },
         }
 
-    def get_info(self, force_update=False):
+    def get_info(self):
         """Gather information from the system"""
-        cur_time = time.time()
-        if force_update or cur_time - self.last_time > self.update_interval:
-            self.last_time = cur_time
-
-            self.value["needs_restart"] = "OFF"
-            self.value["attributes"]["details"] = ""
-            if self.restart_checker is not None:
-                stdout, stderr, returncode = syscommand(
-                    self.restart_checker["command"], ignore_errors=True, timeout=30
-                )
-                if returncode != 0:
-                    self.value["needs_restart"] = "ON"
-                self.value["attributes"]["details"] = stdout
-                if stderr:
-                    logger.warning("Required_restart command stderr: %s", stderr)
-            else:
-                if os.path.exists("/var/run/reboot-required"):
-                    self.value["needs_restart"] = "ON"
-                    if os.path.exists("/var/run/reboot-required.pkgs"):
-                        with open(
-                            "/var/run/reboot-required.pkgs", encoding="utf-8"
-                        ) as pkgs_file:
-                            self.value["attributes"][
-                                "details"
-                            ] = pkgs_file.read().strip()
+        self.value["needs_restart"] = "OFF"
+        self.value["attributes"]["details"] = ""
+        if self.restart_checker is not None:
+            stdout, stderr, returncode = syscommand(
+                self.restart_checker["command"], ignore_errors=True, timeout=30
+            )
+            if returncode != 0:
+                self.value["needs_restart"] = "ON"
+            self.value["attributes"]["details"] = stdout
+            if stderr:
+                logger.warning("Required_restart command stderr: %s", stderr)
+        else:
+            if os.path.exists("/var/run/reboot-required"):
+                self.value["needs_restart"] = "ON"
+                if os.path.exists("/var/run/reboot-required.pkgs"):
+                    with open(
+                        "/var/run/reboot-required.pkgs", encoding="utf-8"
+                    ) as pkgs_file:
+                        self.value["attributes"]["details"] = pkgs_file.read().strip()
         return self.value
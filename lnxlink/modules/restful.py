@@ -69,7 +69,9 @@ class Addon:
                 if addon is not None:
                     if hasattr(addon, "start_control"):
                         try:
-                            result = addon.start_control(topic, message)
+                            result = self.lnxlink.events.call_method(
+                                addon.start_control, topic, message
+                            )
                             return json.dumps(result)
                         except Exception as err:
                             logger.error(
@@ -229,7 +229,9 @@ class Addon:
                     encode_param = [int(self.lib["cv2"].IMWRITE_JPEG_QUALITY), 85]
                     _, buffer = self.lib["cv2"].imencode(".jpg", frame, encode_param)
                     frame_b64 = base64.b64encode(buffer)
-                    self.lnxlink.run_module(f"{self.name}/Screenshot feed", frame_b64)
+                    self.lnxlink.run_module(
+                        f"{self.name}/Screenshot feed", frame_b64, lane="media"
+                    )
 
                     frame_count += 1
 
@@ -275,6 +277,7 @@ class Addon:
                 "type": "camera",
                 "encoding": "b64",
                 "subtopic": True,
+                "qos": 0,
             },
         }
 
@@ -196,7 +196,11 @@ class GitLabClient(RegistryClient):
 
 
 class DockerUpdateStatus:
-    """docstring for DockerUpdateStatus"""
+    """Checks the registries for newer digests of the local images, reusing
+    one HTTP session between checks"""
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
 
     def get_registry_client(
         self, registry: str, repo: str, session: aiohttp.ClientSession
@@ -273,21 +277,22 @@ class DockerUpdateStatus:
 
     async def get_updates(self, images):
         """Checks for updates async"""
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for image in images:
-                if not image.tags:
-                    continue
-                for tag in image.tags:
-                    task = self.check_image_tag(
-                        tag, image.id, image.attrs.get("RepoDigests", []), session
-                    )
-                    tasks.append(task)
-
-            all_results = await asyncio.gather(*tasks)
-
-        return all_results
-
-    def get_updates_sync(self, images):
-        """Run the get_updates synchronously"""
-        return asyncio.run(self.get_updates(images))
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        tasks = []
+        for image in images:
+            if not image.tags:
+                continue
+            for tag in image.tags:
+                task = self.check_image_tag(
+                    tag, image.id, image.attrs.get("RepoDigests", []), self.session
+                )
+                tasks.append(task)
+
+        return await asyncio.gather(*tasks)
+
+    async def close(self):
+        """Closes the HTTP session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
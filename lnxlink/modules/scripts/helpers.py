@@ -1,12 +1,109 @@
 """A collection of helper functions"""
+import functools
+import importlib
 import importlib.metadata
+import importlib.util
+import json
 import logging
 import os
+import queue
+import shlex
 import shutil
 import subprocess
 import sys
+import threading
+import time
 
 logger = logging.getLogger("lnxlink")
+PROVISIONER = None
+
+
+class DependencyPending(Exception):
+    """A package that a module needs is being installed in the background"""
+
+
+class Provisioner:
+    """Installs packages in the background one at a time, failed installations
+    are retried with an exponential backoff"""
+
+    retry_delay = 60
+    max_retry_delay = 3600
+
+    def __init__(self, wheelhouse=None):
+        self.wheelhouse = wheelhouse
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = set()
+        # Package: failed attempts and the time of the next attempt
+        self.failed = {}
+        self.listeners = []
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def add_listener(self, listener):
+        """Calls the listener with the package and the result of each install"""
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stops calling a listener"""
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def failed_recently(self, package_version):
+        """Checks if a package failed and isn't retried yet"""
+        with self.lock:
+            failure = self.failed.get(package_version)
+            return failure is not None and time.monotonic() < failure[1]
+
+    def request(self, package_version):
+        """Adds a package to the installation queue"""
+        with self.lock:
+            if package_version in self.pending:
+                return
+            self.pending.add(package_version)
+        self.queue.put(package_version)
+
+    def run(self):
+        """Installs the queued packages and notifies the listeners"""
+        while True:
+            package_version = self.queue.get()
+            try:
+                success = install_package(package_version, self.wheelhouse)
+            except Exception as err:
+                logger.error("Failed to install %s: %s", package_version, err)
+                success = False
+            with self.lock:
+                self.pending.discard(package_version)
+                if success:
+                    self.failed.pop(package_version, None)
+                else:
+                    self._retry_later(package_version)
+                listeners = list(self.listeners)
+            for listener in listeners:
+                try:
+                    listener(package_version, success)
+                except Exception as err:
+                    logger.error("Error after installing %s: %s", package_version, err)
+
+    def _retry_later(self, package_version):
+        """Requests a failed package again after a delay that doubles on each
+        failure"""
+        attempts = self.failed.get(package_version, (0, 0))[0] + 1
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        self.failed[package_version] = (attempts, time.monotonic() + delay)
+        logger.info("Installing %s again in %s seconds", package_version, delay)
+        timer = threading.Timer(delay, self.request, [package_version])
+        timer.daemon = True
+        timer.start()
+
+
+def start_provisioning(wheelhouse=None):
+    """Installs the missing packages in the background from now on"""
+    global PROVISIONER  # pylint: disable=global-statement
+    if PROVISIONER is None:
+        PROVISIONER = Provisioner(wheelhouse)
+    return PROVISIONER
 
 
 def _get_installer():
@@ -49,6 +146,74 @@ def get_install_method():
     return method
 
 
+def lazy_import(name):
+    """Returns a module that is executed the first time one of its attributes
+    is used, so that heavy imports are paid only when they are needed"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def _install_key(path):
+    """Things that change when LNXlink is installed, updated or moved"""
+    mtimes = []
+    for changed_path in [
+        path,
+        os.path.join(os.path.dirname(path), ".git", "logs", "HEAD"),
+    ]:
+        try:
+            mtimes.append(os.stat(changed_path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return [
+        path,
+        sys.executable,
+        bool(os.environ.get("FLATPAK_ID")),
+        os.path.exists("/.dockerenv"),
+        mtimes,
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_install_info():
+    """Get the version, the path and the install method of the app.
+    Probing them can run git or pacman, so the result is cached on disk
+    until the package directory changes"""
+    path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    cache_path = os.path.join(cache_dir, "lnxlink", "install_info.json")
+    key = _install_key(path)
+    try:
+        with open(cache_path, encoding="UTF-8") as file:
+            cached = json.load(file)
+        if cached.get("key") == key:
+            return cached["version"], path, cached["install_method"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    version, path = get_version()
+    install_method = get_install_method()
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(f"{cache_path}.tmp", "w", encoding="UTF-8") as file:
+            json.dump(
+                {"key": key, "version": version, "install_method": install_method},
+                file,
+            )
+        os.replace(f"{cache_path}.tmp", cache_path)
+    except OSError as err:
+        logger.debug("Could not cache the install information: %s", err)
+    return version, path, install_method
+
+
 def get_version():
     """Get the current version and the path of the app"""
     pkg_name = __package__.split(".", maxsplit=1)[0] if __package__ else __name__
@@ -185,41 +350,25 @@ def import_install_package(package, req_version="", syspackage=None):
 
     if current_version is None or needs_update(current_version, req_version):
         package_version = f"'{package}{req_version}'"
-        logger.info("Installing %s...", package_version)
-        uv_bin = find_uv_bin()
-        returncode = -1
-        if uv_bin:
-            args = [
-                uv_bin,
-                "pip",
-                "install",
-                "--python",
-                sys.executable,
-                "--break-system-packages",
-                "-U",
-                "--quiet",
-                package_version,
-            ]
-            _, _, returncode = syscommand(args, ignore_errors=True, timeout=None)
-
-        if returncode != 0:
-            args = [
-                sys.executable,
-                "-m",
-                "pip",
-                "install",
-                "--break-system-packages",
-                "-U",
-                "--quiet",
-                package_version,
-            ]
-            _, _, returncode = syscommand(args, ignore_errors=True, timeout=None)
-        if returncode != 0:
+        if PROVISIONER is None:
+            installed = install_package(package_version)
+        elif PROVISIONER.failed_recently(package_version):
+            installed = False
+        else:
+            PROVISIONER.request(package_version)
+            if current_version is None:
+                raise DependencyPending(package_version)
+            # The installed version is used until LNXlink restarts
+            installed = True
+        if not installed:
             try:
                 if isinstance(syspackage, tuple):
                     return __import__(syspackage[0], fromlist=syspackage[1])
                 return __import__(syspackage)
             except ModuleNotFoundError:
+                if PROVISIONER is not None:
+                    # The installation is retried later
+                    raise DependencyPending(package_version) from None
                 logger.error("Can't install package %s", package)
                 return None
 
@@ -232,6 +381,62 @@ def import_install_package(package, req_version="", syspackage=None):
         return None
 
 
+def install_package(package_version, wheelhouse=None):
+    """Installs a package with uv or pip. When the wheelhouse directory is set,
+    it's used as a local cache of wheels so that reinstalls work offline"""
+    logger.info("Installing %s...", package_version)
+    if wheelhouse:
+        os.makedirs(wheelhouse, exist_ok=True)
+        offline = ["--no-index", "--find-links", shlex.quote(wheelhouse)]
+        if run_installers(package_version, offline):
+            return True
+        if wheelhouse_ready(package_version, wheelhouse) and run_installers(
+            package_version, offline
+        ):
+            return True
+    return run_installers(package_version)
+
+
+def run_installers(package_version, options=None):
+    """Tries to install a package with uv and then with pip"""
+    installers = [[sys.executable, "-m", "pip", "install"]]
+    uv_bin = find_uv_bin()
+    if uv_bin:
+        installers.insert(0, [uv_bin, "pip", "install", "--python", sys.executable])
+    for installer in installers:
+        args = installer + [
+            "--break-system-packages",
+            "-U",
+            "--quiet",
+            *(options or []),
+            package_version,
+        ]
+        _, _, returncode = syscommand(args, ignore_errors=True, timeout=None)
+        if returncode == 0:
+            importlib.invalidate_caches()
+            return True
+    return False
+
+
+def wheelhouse_ready(package_version, wheelhouse):
+    """Downloads the wheels of a package and its dependencies to the wheelhouse
+    directory, returns False when they can't be collected"""
+    args = [
+        sys.executable,
+        "-m",
+        "pip",
+        "wheel",
+        "--quiet",
+        "--find-links",
+        shlex.quote(wheelhouse),
+        "--wheel-dir",
+        shlex.quote(wheelhouse),
+        package_version,
+    ]
+    _, _, returncode = syscommand(args, ignore_errors=True, timeout=None)
+    return returncode == 0
+
+
 def needs_update(current_version, request_version):
     """Compares two version strings"""
     current_version = str(current_version).strip("><=~")
@@ -21,10 +21,11 @@ class Addon:
         self.lnxlink = lnxlink
         self.lnxlink.add_settings("statistics", self._settings(), replace_empty=True)
         settings = self.lnxlink.config["settings"]["statistics"]
-        # Check for updates every 24 hours
-        self.update_interval = 86400
+        # Check every 15 minutes, send statistics every 24 hours
+        self.update_interval = 900
+        self.report_interval = 86400
         # 15 minutes after lnxlink starts
-        self.last_time = time.time() - self.update_interval + 900
+        self.last_time = time.time() - self.report_interval + 900
         self.url = settings["url"]
         if self.url is None or self.url == "":
             raise SystemError("Statistics is not setup correctly")
@@ -33,7 +34,7 @@ class Addon:
     def get_info(self):
         """Gather information from the system"""
         cur_time = time.time()
-        if cur_time - self.last_time > self.update_interval:
+        if cur_time - self.last_time > self.report_interval:
             version = self.lnxlink.version.split("+")[0]
             data = json.dumps(
                 {
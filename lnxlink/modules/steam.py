@@ -52,7 +52,7 @@ class Addon:
         """Gather information from the system"""
         games = self._get_games()
         if self.games != games:
-            self.lnxlink.setup_discovery("steam")
+            self.lnxlink.request_discovery("steam")
         self.games = games
         return self._get_current_game()
 
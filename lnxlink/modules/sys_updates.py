@@ -1,5 +1,4 @@
 """Track pending packages and update availability in real-time"""
-import time
 from shutil import which
 
 from lnxlink.modules.scripts.helpers import syscommand
@@ -11,7 +10,6 @@ class Addon:
     def __init__(self, lnxlink):
         """Setup addon"""
         self.name = "System Updates"
-        self.last_time = 0
         self.update_interval = 360  # Check for updates every 6 minutes
         self.updates = {
             "needs_update": "OFF",
@@ -64,18 +62,15 @@ class Addon:
             },
         }
 
-    def get_info(self, force_update=False):
+    def get_info(self):
         """Gather information from the system"""
-        cur_time = time.time()
-        if force_update or cur_time - self.last_time > self.update_interval:
-            self.last_time = cur_time
-            stdout, _, _ = syscommand(self.package_manager["command"])
-            if len(stdout) == 0:
-                self.updates["needs_update"] = "OFF"
-                self.updates["packages"]["updates"] = []
-            else:
-                current_updates = sorted(set(filter(None, stdout.split("\n"))))
-                needs_update = len(current_updates) > self.package_manager["largerthan"]
-                self.updates["needs_update"] = "ON" if needs_update else "OFF"
-                self.updates["packages"]["updates"] = current_updates
+        stdout, _, _ = syscommand(self.package_manager["command"])
+        if len(stdout) == 0:
+            self.updates["needs_update"] = "OFF"
+            self.updates["packages"]["updates"] = []
+        else:
+            current_updates = sorted(set(filter(None, stdout.split("\n"))))
+            needs_update = len(current_updates) > self.package_manager["largerthan"]
+            self.updates["needs_update"] = "ON" if needs_update else "OFF"
+            self.updates["packages"]["updates"] = current_updates
         return self.updates
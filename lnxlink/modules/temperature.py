@@ -1,8 +1,6 @@
 """Monitor thermal data from all discovered system sensors"""
 import logging
 
-import psutil
-
 logger = logging.getLogger("lnxlink")
 
 
@@ -25,6 +23,7 @@ class Addon:
                 "state_class": "measurement",
                 "device_class": "temperature",
                 "unit": "°C",
+                "deadband": 0.5,
                 "value_template": f"{{{{ value_json.get('{key}') }}}}",
                 "enabled": True,
             }
@@ -39,7 +38,7 @@ class Addon:
     def _get_temperatures(self):
         """Get a list of all temperatures"""
         temperatures = {}
-        for item, values in psutil.sensors_temperatures().items():
+        for item, values in self.lnxlink.sampler.get("temperature").items():
             for value in values:
                 name = f"{item} {value.label}".strip()
                 key = name.replace(" ", "_").lower()
@@ -2,7 +2,6 @@
 import logging
 import re
 import sys
-import time
 
 import requests
 
@@ -18,7 +17,6 @@ class Addon:
         """Setup addon"""
         self.name = "LNXlink update"
         self.lnxlink = lnxlink
-        self.last_time = 0
         self.update_interval = 86400  # Check for updates every 24 hours
         self.message = {
             "installed_version": self.lnxlink.version,
@@ -44,13 +42,9 @@ class Addon:
             },
         }
 
-    def get_info(self, force_update=False):
+    def get_info(self):
         """Gather information from the system"""
-        cur_time = time.time()
-        if force_update or cur_time - self.last_time > self.update_interval:
-            self._latest_version()
-            self.last_time = cur_time
-
+        self._latest_version()
         return self.message
 
     def _latest_version(self):
@@ -68,13 +62,13 @@ class Addon:
     def start_control(self, topic, data):
         """Control system"""
         self.message["in_progress"] = True
-        self.lnxlink.run_module(self.name, self.get_info)
+        self.lnxlink.run_module(self.name, self.message)
         try:
             if self._run_update():
                 self.lnxlink.restart_script()
         finally:
             self.message["in_progress"] = False
-            self.lnxlink.run_module(self.name, self.get_info)
+            self.lnxlink.run_module(self.name, self.message)
 
     def _run_update(self):
         """Run the appropriate update command based on install method"""
@@ -1,8 +1,10 @@
-"""Watches for configuration changes and restarts LNXlink"""
+"""Watches for configuration changes and reloads LNXlink"""
 import hashlib
 import logging
 import os
 
+import inotify.constants
+
 logger = logging.getLogger("lnxlink")
 
 
@@ -13,19 +15,47 @@ class Addon:
         """Setup addon"""
         self.name = "Watch Changes"
         self.lnxlink = lnxlink
-        self.last_time = 0
         self.last_updated = os.path.getmtime(self.lnxlink.config_path)
         self.last_hash = self._get_file_hash(self.lnxlink.config_path)
+        self.watch = None
+        # The directory is watched, since editors replace the file when saving
+        config_dir, self.config_file = os.path.split(self.lnxlink.config_path)
+        try:
+            self.watch = self.lnxlink.events.watch_path(
+                config_dir,
+                self.path_changed,
+                inotify.constants.IN_CLOSE_WRITE | inotify.constants.IN_MOVED_TO,
+            )
+        except Exception as err:
+            logger.warning("Can't watch config with inotify, polling it: %s", err)
+        self.event_driven = self.watch is not None
 
     def get_info(self):
         """Gather information from the system"""
+        if self.watch is not None:
+            return
         current_time = os.path.getmtime(self.lnxlink.config_path)
         if current_time != self.last_updated:
             self.last_updated = current_time
-            current_hash = self._get_file_hash(self.lnxlink.config_path)
-            if current_hash != self.last_hash:
-                self.last_hash = current_hash
-                self.lnxlink.restart_script()
+            self.config_changed()
+
+    def path_changed(self, _path, filename, _mask):
+        """Called by inotify when a file of the config directory is written"""
+        if filename == self.config_file:
+            self.config_changed()
+
+    def config_changed(self):
+        """Reloads the configuration when its content has changed"""
+        current_hash = self._get_file_hash(self.lnxlink.config_path)
+        if current_hash is not None and current_hash != self.last_hash:
+            self.last_hash = current_hash
+            self.lnxlink.reload_config()
+
+    def disconnect(self):
+        """Stops watching the configuration"""
+        if self.watch is not None:
+            self.lnxlink.events.unwatch_path(self.watch)
+            self.watch = None
 
     def _get_file_hash(self, filepath):
         """Generates a SHA-256 hash of the file content."""
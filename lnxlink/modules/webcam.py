@@ -31,7 +31,7 @@ class Addon:
                 break
             _, buffer = self.lib["cv2"].imencode(".jpg", frame)
             frame = base64.b64encode(buffer)
-            self.lnxlink.run_module(f"{self.name}/Webcam feed", frame)
+            self.lnxlink.run_module(f"{self.name}/Webcam feed", frame, lane="media")
 
     def get_info(self):
         """Gather information from the system"""
@@ -51,6 +51,7 @@ class Addon:
                 "type": "camera",
                 "encoding": "b64",
                 "subtopic": True,
+                "qos": 0,
             },
         }
 
@@ -1,61 +1,90 @@
 """MQTT methods"""
 
 
-import asyncio
+import hashlib
 import json
 import logging
-import os
+import random
 import ssl
 import threading
 import time
 import traceback
-from dataclasses import dataclass
 
-import aiohttp
 import distro
 import paho.mqtt.client as mqtt
-import requests
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 
+from lnxlink.homeassistant_api import HomeAssistantApiClient
 from lnxlink.modules.scripts import helpers
 
 logger = logging.getLogger("lnxlink")
 
 
-@dataclass
-class PublishInfo:
-    """Small paho-compatible publish result for alternate transports."""
-
-    rc: int
-    mid: int
-
-
-@dataclass
-class CommandMessage:
-    """MQTT-like command message passed to the existing on_message handler."""
-
-    topic: str
-    payload: bytes
-
-
+# pylint: disable=too-many-instance-attributes
 class DirectMQTTClient:
     """Direct MQTT broker client using paho-mqtt."""
 
     def __init__(self, config):
         self.config = config
         self._disconnecting = False
+        self._on_connect = None
+        self.use_v5 = str(self.config["mqtt"].get("protocol", "3.1.1")) == "5"
+        self.alias_maximum = 0
+        self.topic_aliases = {}
+        self.published_topics = set()
+        self.empty_alias_topics = True
+        # A new alias has to be sent before the messages that refer to it
+        self._alias_lock = threading.RLock()
+        protocol = mqtt.MQTTv5 if self.use_v5 else mqtt.MQTTv311
         if hasattr(mqtt, "CallbackAPIVersion"):
             self.client = mqtt.Client(
                 client_id=f"LNXlink-{self.config['mqtt']['clientId']}",
                 callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+                protocol=protocol,
             )
         else:
             self.client = mqtt.Client(
-                client_id=f"LNXlink-{self.config['mqtt']['clientId']}"
+                client_id=f"LNXlink-{self.config['mqtt']['clientId']}",
+                protocol=protocol,
             )
 
+    def on_connect(self, client, userdata, flags, rcode, *args):
+        """Topic aliases are valid only during a connection, so they are reset
+        using the maximum that the broker accepts"""
+        properties = args[0] if args else None
+        with self._alias_lock:
+            self.restore_alias_topics()
+            self.alias_maximum = getattr(properties, "TopicAliasMaximum", 0) or 0
+            self.topic_aliases = {}
+        self._on_connect(client, userdata, flags, rcode, *args)
+
+    def restore_alias_topics(self):
+        """Messages that paho sends again after reconnecting can't refer to the
+        aliases of the old connection, so they get back their topics. paho
+        calls on_connect before sending them."""
+        topics = {alias: topic for topic, alias in self.topic_aliases.items()}
+        # pylint: disable=protected-access
+        with self.client._out_message_mutex:
+            for message in self.client._out_messages.values():
+                alias = getattr(message.properties, "TopicAlias", None)
+                if alias is None:
+                    continue
+                if not message.topic and alias in topics:
+                    message._topic = topics[alias].encode("UTF-8")
+                delattr(message.properties, "TopicAlias")
+
+    # pylint: disable=too-many-locals
     def connect(self, on_connect, on_message, on_disconnect, on_publish):
         """Connect to the configured MQTT broker directly."""
-        self.client.on_connect = on_connect
+        self._on_connect = on_connect
+        self.client.max_inflight_messages_set(
+            int(self.config["mqtt"].get("max_inflight", 20))
+        )
+        self.client.max_queued_messages_set(
+            int(self.config["mqtt"].get("max_queued", 0))
+        )
+        self.client.on_connect = self.on_connect
         self.client.on_message = on_message
         self.client.on_disconnect = on_disconnect
         self.client.on_publish = on_publish
@@ -96,6 +125,11 @@ class DirectMQTTClient:
                 qos=self.config["mqtt"]["lwt"]["qos"],
                 retain=True,
             )
+        reconnect = self.config["mqtt"].get("reconnect") or {}
+        self.client.reconnect_delay_set(
+            min_delay=max(1, int(reconnect.get("min_delay", 1))),
+            max_delay=int(reconnect.get("max_delay", 60)),
+        )
         try:
             self.client.connect(
                 host=self.config["mqtt"]["server"],
@@ -128,17 +162,63 @@ class DirectMQTTClient:
         self.client.loop_start()
         return True
 
-    def publish(self, topic, payload, qos=1, retain=True):
+    # pylint: disable=too-many-arguments
+    def publish(self, topic, payload, qos=1, retain=True, expiry=None):
         """Publishes message using direct MQTT broker."""
-        msg_info = self.client.publish(
-            topic,
-            payload=payload,
-            qos=qos,
-            retain=retain,
-        )
+        properties = None
+        with self._alias_lock:
+            if self.use_v5:
+                topic, properties = self.publish_properties(topic, payload, qos, expiry)
+            try:
+                msg_info = self.client.publish(
+                    topic,
+                    payload=payload,
+                    qos=qos,
+                    retain=retain,
+                    properties=properties,
+                )
+            except ValueError:
+                if topic:
+                    raise
+                # This paho version doesn't allow an empty topic with an alias
+                self.empty_alias_topics = False
+                return self.publish(self.alias_topic(properties), payload, qos, retain)
         logger.debug("Message RC Code: %s, MQTT Number: %s", msg_info.rc, msg_info.mid)
         return msg_info
 
+    def publish_properties(self, topic, payload, qos, expiry):
+        """Returns the topic and the MQTT v5 properties of a message.
+        Aliases are given to the topics that are published again, so that the
+        discovery configs, which are published once, don't use them up"""
+        properties = Properties(PacketTypes.PUBLISH)
+        if isinstance(payload, bytes):
+            properties.ContentType = "application/octet-stream"
+        elif isinstance(payload, str) and payload[:1] in ["{", "["]:
+            properties.ContentType = "application/json"
+        else:
+            properties.ContentType = "text/plain"
+        if expiry:
+            properties.MessageExpiryInterval = int(expiry)
+        alias = self.topic_aliases.get(topic)
+        if alias is not None:
+            properties.TopicAlias = alias
+            return ("" if self.empty_alias_topics else topic), properties
+        if topic not in self.published_topics:
+            self.published_topics.add(topic)
+        elif len(self.topic_aliases) < self.alias_maximum:
+            alias = len(self.topic_aliases) + 1
+            self.topic_aliases[topic] = alias
+            properties.TopicAlias = alias
+        return topic, properties
+
+    def alias_topic(self, properties):
+        """Returns the topic of the alias in the properties"""
+        alias = getattr(properties, "TopicAlias", None)
+        for topic, topic_alias in self.topic_aliases.items():
+            if topic_alias == alias:
+                return topic
+        return ""
+
     def reconnect(self):
         """Reconnect to direct MQTT broker."""
         logger.info("Reconnecting to MQTT")
@@ -160,270 +240,157 @@ class DirectMQTTClient:
 
 
 # pylint: disable=too-many-instance-attributes
-class HomeAssistantApiClient:
-    """MQTT client transport via Home Assistant HTTP and WebSocket APIs."""
-
-    def __init__(self, config):
-        self.config = config
-        self._publish_mid = 0
-        self._publish_lock = threading.Lock()
-        self._stop_event = threading.Event()
-        self.is_disconnecting = False
-        self._ws_thread = None
-        self._on_message_callback = None
-        self.session = requests.Session()
-
-    def _get_ha_config(self):
-        """Return Home Assistant API transport configuration."""
-        ha_config = self.config["mqtt"].get("homeassistant", {})
-        return {
-            "url": str(ha_config.get("url", "")).rstrip("/"),
-            "token": self._get_token(ha_config),
-            "timeout": float(ha_config.get("timeout", 20)),
-            "verify_ssl": self._config_bool(ha_config.get("verify_ssl", True)),
-            "subscribe_commands": self._config_bool(
-                ha_config.get("subscribe_commands", True)
-            ),
-        }
-
-    def _config_bool(self, value):
-        """Parse boolean config values."""
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, str):
-            return value.lower() in ["1", "true", "yes", "on"]
-        return bool(value)
-
-    def _get_token(self, ha_config):
-        """Read the Home Assistant long-lived access token."""
-        token = str(ha_config.get("token", "")).strip()
-        if not token:
-            return ""
-
-        token_path = os.path.expanduser(token)
-        if os.path.isfile(token_path):
-            try:
-                with open(token_path, encoding="UTF-8") as file:
-                    return file.read().strip()
-            except OSError as err:
-                logger.error("Could not read Home Assistant token file: %s", err)
-                return ""
-
-        return token
-
-    def connect(self, on_connect, on_message, on_disconnect, on_publish):
-        """Connect to Home Assistant API for MQTT publish and commands."""
-        ha_config = self._get_ha_config()
-        if not ha_config["url"] or not ha_config["token"]:
-            logger.error(
-                "Home Assistant MQTT API transport needs mqtt.homeassistant.url "
-                "and token"
-            )
-            return False
-
-        self._on_message_callback = on_message
-        logger.info("Home Assistant MQTT API transport: %s", ha_config["url"])
-        on_connect(self, None, None, 0)
-        if ha_config["subscribe_commands"]:
-            self._start_websocket()
-        return True
-
-    def publish(self, topic, payload, qos=1, retain=True):
-        """Publish MQTT message through Home Assistant's mqtt.publish service."""
-        ha_config = self._get_ha_config()
-        if payload is None:
-            payload = ""
-        elif isinstance(payload, bytes):
-            payload = payload.decode("UTF-8")
-        elif not isinstance(payload, str):
-            payload = str(payload)
-
-        timeout = 2.0 if self.is_disconnecting else ha_config["timeout"]
-
-        try:
-            response = self.session.post(
-                f"{ha_config['url']}/api/services/mqtt/publish",
-                headers={
-                    "Authorization": f"Bearer {ha_config['token']}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "topic": topic,
-                    "payload": payload,
-                    "qos": qos,
-                    "retain": retain,
-                },
-                timeout=timeout,
-                verify=ha_config["verify_ssl"],
-            )
-            response.raise_for_status()
-            rc = 0
-        except Exception as err:
-            logger.error("Home Assistant MQTT publish failed: %s", err)
-            logger.debug(traceback.format_exc())
-            rc = 1
-
-        with self._publish_lock:
-            self._publish_mid += 1
-            mid = self._publish_mid
-
-        logger.debug("Message RC Code: %s, MQTT Number: %s", rc, mid)
-        return PublishInfo(rc=rc, mid=mid)
-
-    def reconnect(self):
-        """Reconnect to Home Assistant MQTT WebSocket."""
-        logger.info("Reconnecting to Home Assistant MQTT websocket")
-        self._stop_event.set()
-        if self._ws_thread and self._ws_thread.is_alive():
-            self._ws_thread.join(timeout=2)
-        self._start_websocket()
-
-    def disconnect(self):
-        """Disconnect from Home Assistant API."""
-        self.is_disconnecting = True
-        self._stop_event.set()
-        if self._ws_thread and self._ws_thread.is_alive():
-            self._ws_thread.join(timeout=2)
-        try:
-            self.session.close()
-        except Exception:
-            pass
-        logger.info("Disconnected from Home Assistant MQTT API.")
-
-    def subscribe(self, topic):
-        """Subscriptions are owned by the websocket bridge."""
-        logger.debug("Home Assistant websocket subscribes to %s", topic)
-
-    def _start_websocket(self):
-        """Start the Home Assistant websocket MQTT subscription thread."""
-        if self._ws_thread and self._ws_thread.is_alive():
-            return
-        self._stop_event.clear()
-        self._ws_thread = threading.Thread(
-            target=self._run_websocket,
-            daemon=True,
-        )
-        self._ws_thread.start()
-
-    def _run_websocket(self):
-        """Run the Home Assistant websocket bridge in its own event loop."""
-        try:
-            asyncio.run(self._websocket_loop())
-        except Exception as err:
-            logger.error("Home Assistant MQTT websocket failed: %s", err)
-            logger.debug(traceback.format_exc())
-
-    async def _websocket_loop(self):
-        """Subscribe to command topics through Home Assistant websocket."""
-        ha_config = self._get_ha_config()
-        command_topic = f"{self.config['pref_topic']}/commands/#"
-        while not self._stop_event.is_set():
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.ws_connect(
-                        f"{ha_config['url']}/api/websocket",
-                        heartbeat=30,
-                        ssl=ha_config["verify_ssl"],
-                    ) as websocket:
-                        auth_required = await websocket.receive_json()
-                        if auth_required.get("type") != "auth_required":
-                            raise RuntimeError(
-                                f"Unexpected Home Assistant websocket hello: {auth_required}"
-                            )
-                        await websocket.send_json(
-                            {
-                                "type": "auth",
-                                "access_token": ha_config["token"],
-                            }
-                        )
-                        auth_result = await websocket.receive_json()
-                        if auth_result.get("type") != "auth_ok":
-                            raise RuntimeError(
-                                f"Home Assistant websocket auth failed: {auth_result}"
-                            )
-                        await websocket.send_json(
-                            {
-                                "id": 1,
-                                "type": "mqtt/subscribe",
-                                "topic": command_topic,
-                            }
-                        )
-                        subscribe_result = await websocket.receive_json()
-                        if not subscribe_result.get("success"):
-                            raise RuntimeError(
-                                "Home Assistant MQTT subscribe failed: "
-                                f"{subscribe_result}"
-                            )
-                        logger.info(
-                            "Subscribed to MQTT commands through Home Assistant API: %s",
-                            command_topic,
-                        )
-                        await self._receive_commands(websocket)
-            except Exception as err:
-                if not self._stop_event.is_set():
-                    logger.error("Home Assistant MQTT websocket disconnected: %s", err)
-                    logger.debug(traceback.format_exc())
-                    await asyncio.sleep(5)
-
-    async def _receive_commands(self, websocket):
-        """Forward Home Assistant websocket MQTT events to the command handler."""
-        while not self._stop_event.is_set():
-            try:
-                message = await websocket.receive(timeout=1)
-            except asyncio.TimeoutError:
-                continue
-            if message.type == aiohttp.WSMsgType.TEXT:
-                data = json.loads(message.data)
-                event = data.get("event", {})
-                topic = event.get("topic")
-                payload = event.get("payload", "")
-                if topic and self._on_message_callback is not None:
-                    if not isinstance(payload, str):
-                        payload = json.dumps(payload)
-                    self._on_message_callback(
-                        self,
-                        None,
-                        CommandMessage(topic=topic, payload=payload.encode("UTF-8")),
-                    )
-            elif message.type in (
-                aiohttp.WSMsgType.CLOSED,
-                aiohttp.WSMsgType.CLOSE,
-                aiohttp.WSMsgType.ERROR,
-            ):
-                raise RuntimeError(f"websocket closed: {message.type}")
-
-
 class MQTT:
     """Start LNXlink service that loads all modules and connects to MQTT"""
 
-    def __init__(self, config):
+    def __init__(self, config, loop=None):
         self.config = config
+        self.loop = loop
         self.publish_rc_code = 0
+        self.state = "disconnected"
+        self.connected_event = threading.Event()
         self.transport = self.config["mqtt"].get("transport", "mqtt")
+        self.message_expiry = self.config["mqtt"].get("message_expiry") or None
         self._on_connect_callback = None
         self._on_message_callback = None
+        self._device_info = None
+        self.discovery_published = 0
+        self.discovery_delay = 0
+        self._state_lock = threading.Lock()
+        self._reconnecting = False
+        self._stop_event = threading.Event()
+        self._disconnected_since = time.monotonic()
+        reconnect = self.config["mqtt"].get("reconnect") or {}
+        self.backoff_min = float(reconnect.get("min_delay", 1))
+        self.backoff_max = float(reconnect.get("max_delay", 60))
+        self.diagnostics = {
+            "state": self.state,
+            "disconnects": 0,
+            "attempts": 0,
+            "coalesced_failures": 0,
+            "last_reconnect_duration": None,
+            "inflight": {"qos0": 0, "qos1": 0, "qos2": 0},
+        }
+        self._inflight = {}
+        self._early_acks = set()
+        self._inflight_lock = threading.RLock()
+        # Called with the topic, payload and retain flag of the messages that
+        # the Home Assistant API couldn't publish
+        self.on_publish_failed = None
 
         if self.transport == "homeassistant_api":
-            self.client = HomeAssistantApiClient(config)
+            self.client = HomeAssistantApiClient(config, self.loop, self.publish_failed)
         else:
             self.client = DirectMQTTClient(config)
 
-    def publish(self, topic, payload, retain=True):
-        """Publishes messages to the MQTT broker"""
-        qos = self.config["mqtt"]["lwt"]["qos"]
-        msg_info = self.client.publish(topic, payload, qos=qos, retain=retain)
+    # pylint: disable=too-many-arguments
+    def publish(self, topic, payload, retain=True, expiry=None, qos=None):
+        """Publishes messages to the MQTT broker, the expiry in seconds is used
+        only with MQTT v5"""
+        if qos is None:
+            qos = self.config["mqtt"]["lwt"]["qos"]
+        # paho holds its message lock while it calls on_publish, so the
+        # in-flight lock can't be held while publishing
+        msg_info = self.client.publish(
+            topic, payload, qos=qos, retain=retain, expiry=expiry
+        )
+        if msg_info.rc == 0 and isinstance(self.client, DirectMQTTClient):
+            with self._inflight_lock:
+                # The acknowledgement can arrive before the mid is registered
+                if msg_info.mid in self._early_acks:
+                    self._early_acks.discard(msg_info.mid)
+                else:
+                    self._inflight[msg_info.mid] = qos
+                    self.diagnostics["inflight"][f"qos{qos}"] += 1
         self.publish_rc_code = msg_info.rc
         return msg_info
 
+    @property
+    def connected(self):
+        """Checks if the connection to the broker is up"""
+        return self.state == "connected"
+
+    def set_state(self, state):
+        """Changes the connection state and measures how long reconnecting took"""
+        dropped = False
+        with self._state_lock:
+            if state == self.state:
+                return
+            now = time.monotonic()
+            if state == "connected":
+                self.diagnostics["last_reconnect_duration"] = round(
+                    now - self._disconnected_since, 3
+                )
+                self.connected_event.set()
+            elif self.state == "connected":
+                self._disconnected_since = now
+                self.diagnostics["disconnects"] += 1
+                self.connected_event.clear()
+                dropped = True
+            self.state = state
+            self.diagnostics["state"] = state
+        if dropped:
+            self.forget_qos0()
+
+    def forget_qos0(self):
+        """QoS 0 messages that weren't sent are dropped on a disconnection"""
+        with self._inflight_lock:
+            for mid, qos in list(self._inflight.items()):
+                if qos == 0:
+                    del self._inflight[mid]
+            self.diagnostics["inflight"]["qos0"] = 0
+            self._early_acks.clear()
+
+    def set_connected(self):
+        """Called by the connect callback when the broker accepts the connection"""
+        self.set_state("connected")
+
     def reconnect(self):
-        """Try to reconnect to broker"""
-        self.publish_rc_code = 0
-        self.client.reconnect()
+        """Requests a reconnection to the broker, failures that happen while a
+        reconnection is in progress are coalesced into it"""
+        with self._state_lock:
+            if self._reconnecting:
+                self.diagnostics["coalesced_failures"] += 1
+                return
+            self._reconnecting = True
+        self.set_state("reconnecting")
+        threading.Thread(target=self._reconnect_worker, daemon=True).start()
+
+    def _reconnect_worker(self):
+        """Tries to reconnect with exponential backoff and jitter"""
+        attempt = 0
+        try:
+            while not self._stop_event.is_set():
+                delay = min(self.backoff_max, self.backoff_min * 2**attempt)
+                if self._stop_event.wait(random.uniform(delay / 2, delay)):
+                    return
+                attempt += 1
+                self.diagnostics["attempts"] += 1
+                logger.info("Reconnecting to MQTT, attempt %s", attempt)
+                try:
+                    if self.transport == "auto" and not isinstance(
+                        self.client, HomeAssistantApiClient
+                    ):
+                        self.switch_to_homeassistant_api()
+                    else:
+                        self.publish_rc_code = 0
+                        self.client.reconnect()
+                        if isinstance(self.client, HomeAssistantApiClient):
+                            self.set_connected()
+                except Exception as err:
+                    logger.error("MQTT reconnect failed: %s", err)
+                if self.connected_event.wait(timeout=10):
+                    return
+        finally:
+            with self._state_lock:
+                self._reconnecting = False
 
     def disconnect(self):
         """Used when exiting"""
+        self._stop_event.set()
         self.send_lwt("OFF")
         self.client.disconnect()
+        self.set_state("disconnected")
 
     def send_lwt(self, status):
         """Sends the status of lwt, ON or OFF"""
@@ -467,7 +434,9 @@ class MQTT:
 
         logger.info("Switching MQTT transport to Home Assistant API")
         self.client.disconnect()
-        self.client = HomeAssistantApiClient(self.config)
+        self.client = HomeAssistantApiClient(
+            self.config, self.loop, self.publish_failed
+        )
         return self.client.connect(
             on_connect=self._on_connect_callback,
             on_message=self._on_message_callback,
@@ -476,40 +445,121 @@ class MQTT:
         )
 
     def on_publish(self, client, userdata, mid, *args):
-        """Trying to reconnect if the reason code is not Success"""
+        """Trying to reconnect if the reason code is a failure"""
+        with self._inflight_lock:
+            qos = self._inflight.pop(mid, None)
+            if qos is None:
+                self._early_acks.add(mid)
+            else:
+                self.diagnostics["inflight"][f"qos{qos}"] -= 1
         reason_code = args[0] if args else None
-        if reason_code is not None and reason_code != "Success":
+        # MQTT v5 acknowledges with codes such as 0x10, which aren't failures
+        if getattr(reason_code, "is_failure", False):
             logger.error("Publish Error, trying to reconnect...")
             self.reconnect()
 
+    def publish_failed(self, topic, payload, retain):
+        """A message that was accepted by the transport wasn't published"""
+        if self.on_publish_failed is not None:
+            self.on_publish_failed(topic, payload, retain)
+
     def on_disconnect(self, *args):
-        """Disconnected from MQTT broker"""
+        """Disconnected from MQTT broker, the paho loop reconnects by itself
+        unless the transport falls back to the Home Assistant API"""
         if getattr(self.client, "_disconnecting", False):
             return
-        logger.warning("Lost connection to MQTT Broker...")
+        if self.state == "connected":
+            logger.warning("Lost connection to MQTT Broker...")
+            self.set_state("disconnected")
         if self.transport == "auto":
-            threading.Thread(
-                target=self.switch_to_homeassistant_api, daemon=True
-            ).start()
+            self.reconnect()
 
     def get_rcode_name(self, rcode):
         """Returns the rcode message"""
         if isinstance(self.client, HomeAssistantApiClient) and rcode == 0:
             return "Success"
+        if hasattr(rcode, "getName"):
+            return rcode.getName()
         return mqtt.connack_string(rcode)
 
+    def state_topic(self, addon, exp_name, options):
+        """Returns the topic where the state of an exposed control is published"""
+        subtopic = helpers.text_to_topic(addon.name)
+        if "method" in options or options.get("subtopic", False):
+            subcontrol = helpers.text_to_topic(exp_name)
+            subtopic = f"{subtopic}/{subcontrol}"
+        topic_category = options.get("topic_category", "monitor_controls")
+        category_path = f"/{topic_category}" if topic_category else ""
+        return f"{self.config['pref_topic']}{category_path}/{subtopic}"
+
     # pylint: disable=too-many-locals
-    def setup_discovery_entities(self, addon, service, exp_name, options):
-        """Send discovery information on Home Assistant for controls"""
-        discovery_template = {
-            "device": {
+    def device_info(self):
+        """Device block of the discovery configs, it's the same for all entities"""
+        if self._device_info is None:
+            self._device_info = {
                 "identifiers": [self.config["mqtt"]["clientId"]],
                 "name": self.config["mqtt"]["clientId"],
                 "model": f"{distro.name()} {distro.version()}",
                 "manufacturer": "LNXlink",
                 "sw_version": self.config["version"],
+            }
+        return self._device_info
+
+    def publish_discovery(self, discovery_topic, discovery, hashes=None):
+        """Publish a discovery config unless its hash is the same as the one in
+        hashes, which is updated with the successfully published configs"""
+        payload = json.dumps(discovery)
+        digest = None
+        if hashes is not None:
+            digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+            if hashes.get(discovery_topic) == digest:
+                return
+        self.discovery_published += 1
+        if self.discovery_delay > 0:
+            time.sleep(self.discovery_delay)
+        msg_info = self.publish(
+            discovery_topic,
+            payload=payload,
+        )
+        if digest is not None and msg_info.rc == 0:
+            hashes[discovery_topic] = digest
+
+    # pylint: disable=too-many-arguments
+    def setup_discovery_entities(self, addon, service, exp_name, options, hashes=None):
+        """Send discovery information on Home Assistant for controls"""
+        discovery_topic, discovery = self.discovery_config(
+            addon, service, exp_name, options
+        )
+        if discovery_topic is None:
+            return None
+        discovery["device"] = self.device_info()
+        self.publish_discovery(discovery_topic, discovery, hashes)
+        if options["type"] == "media_player":
+            logger.info(
+                "MQTT Media Player configuration name: lnxlink/%s",
+                discovery["unique_id"],
+            )
+        return discovery_topic
+
+    def setup_discovery_device(self, components, hashes=None):
+        """Send one discovery config for the device with all of its components"""
+        discovery_prefix = self.config["mqtt"]["discovery"]["prefix"]
+        device_id = helpers.text_to_topic(self.config["mqtt"]["clientId"])
+        discovery_topic = f"{discovery_prefix}/device/lnxlink/{device_id}/config"
+        discovery = {
+            "device": self.device_info(),
+            "origin": {
+                "name": "LNXlink",
+                "sw_version": self.config["version"],
             },
+            "components": components,
         }
+        self.publish_discovery(discovery_topic, discovery, hashes)
+        return discovery_topic
+
+    def discovery_config(self, addon, service, exp_name, options):
+        """Returns the discovery topic and config of a control without the device"""
+        discovery_template = {}
         if options.get("use_availability", True):
             discovery_template["availability"] = {
                 "topic": f"{self.config['pref_topic']}/lwt",
@@ -517,13 +567,7 @@ class MQTT:
                 "payload_not_available": "OFF",
             }
 
-        subtopic = helpers.text_to_topic(addon.name)
-        if "method" in options or options.get("subtopic", False):
-            subcontrol = helpers.text_to_topic(exp_name)
-            subtopic = f"{subtopic}/{subcontrol}"
-        topic_category = options.get("topic_category", "monitor_controls")
-        category_path = f"/{topic_category}" if topic_category else ""
-        state_topic = f"{self.config['pref_topic']}{category_path}/{subtopic}"
+        state_topic = self.state_topic(addon, exp_name, options)
         control_name_topic = helpers.text_to_topic(exp_name)
         command_topic = (
             f"{self.config['pref_topic']}/commands/{service}/{control_name_topic}"
@@ -655,7 +699,7 @@ class MQTT:
 
         if options["type"] not in lookup_entities:
             logger.error("Not supported: %s", options["type"])
-            return None
+            return None, None
         if "value_template" in discovery and options["type"] in ["camera", "image"]:
             discovery.pop("json_attributes_topic", None)
             discovery.pop("json_attributes_template", None)
@@ -664,13 +708,4 @@ class MQTT:
             f"{discovery_prefix}/{options['type']}/lnxlink/"
             f"{discovery['unique_id']}/config"
         )
-        self.publish(
-            discovery_topic,
-            payload=json.dumps(discovery),
-        )
-        if options["type"] == "media_player":
-            logger.info(
-                "MQTT Media Player configuration name: lnxlink/%s",
-                discovery["unique_id"],
-            )
-        return discovery_topic
+        return discovery_topic, discovery
@@ -0,0 +1,294 @@
+"""Publish queue and the helpers that decide which payloads are published"""
+
+import copy
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger("lnxlink")
+
+VALUE_TEMPLATE = re.compile(
+    r"^\{\{\s*value(?:_json("
+    r"(?:\.get\(\s*['\"][^'\"]*['\"][^)]*\)|\[\s*['\"][^'\"]*['\"]\s*\]|\.\w+)*"
+    r"))?\s*\}\}$"
+)
+TEMPLATE_KEY = re.compile(
+    r"\.get\(\s*['\"]([^'\"]*)['\"]|\[\s*['\"]([^'\"]*)['\"]|\.(\w+)"
+)
+
+
+class UniqueQueue:
+    """
+    A queue that maintains unique named items split in priority lanes.
+    Each lane has its own size limit, drop policy and draining weight:
+      - event: interactive updates that are never replaced, the oldest are
+        dropped only when the lane reaches its hard_limit.
+      - telemetry: periodic sensors, an item replaces the one with the same name
+        and the oldest item is discarded when the lane is full.
+      - media: bulk binary frames, same as telemetry with a much smaller limit.
+    Consumers waiting on the queue are woken up as soon as an item arrives.
+    """
+
+    default_lanes = {
+        "event": {"max_size": 200, "policy": "never_drop", "weight": 4},
+        "telemetry": {"max_size": 200, "policy": "latest_wins", "weight": 2},
+        "media": {"max_size": 4, "policy": "latest_wins", "weight": 1},
+    }
+    lane_defaults = {"max_size": 200, "policy": "latest_wins", "weight": 1}
+    warning_interval = 60
+
+    def __init__(self, lanes=None):
+        """Initializes the UniqueQueue"""
+        self.lanes = copy.deepcopy(self.default_lanes)
+        for lane, options in (lanes or {}).items():
+            self.lanes.setdefault(lane, dict(self.lane_defaults)).update(options)
+        self.queues = {}
+        for lane, options in self.lanes.items():
+            if options["policy"] == "never_drop":
+                self.queues[lane] = deque()
+            else:
+                self.queues[lane] = OrderedDict()
+        self.drops = {lane: 0 for lane in self.lanes}
+        self._warned = {}
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+
+    def __repr__(self):
+        """Returns a string representation of the queue."""
+        return f"<{self.__class__.__name__} queues: {repr(self.queues)}>"
+
+    def __iter__(self):
+        """Returns an iterator that yields and removes items from the lanes by weight"""
+        lane_credits = {}
+        while True:
+            with self._lock:
+                item = self._pop_weighted(lane_credits)
+            if item is None:
+                break
+            yield item
+
+    def _pop_weighted(self, lane_credits):
+        """Pops the next item, each lane can give up to its weight items per round"""
+        for _ in range(2):
+            for lane, options in self.lanes.items():
+                remaining = lane_credits.get(lane, options["weight"])
+                if self.queues[lane] and remaining > 0:
+                    lane_credits[lane] = remaining - 1
+                    if options["policy"] == "never_drop":
+                        return self.queues[lane].popleft()
+                    return self.queues[lane].popitem(last=False)
+            lane_credits.clear()
+        return None
+
+    # pylint: disable=too-many-arguments
+    def add_item(self, name, value, retain=True, force_publish=False, lane="telemetry"):
+        """Adds an item to the queue lane, applying the drop policy of the lane"""
+        item = (value, retain, force_publish, time.monotonic(), lane)
+        with self._lock:
+            options = self.lanes[lane]
+            items = self.queues[lane]
+            if options["policy"] == "never_drop":
+                items.append((name, item))
+                if len(items) > options.get("hard_limit", 10 * options["max_size"]):
+                    items.popleft()
+                    self.drops[lane] += 1
+                if len(items) > options["max_size"]:
+                    self._warn_saturated(lane, len(items))
+            else:
+                if name in items:
+                    del items[name]
+                elif len(items) >= options["max_size"]:
+                    items.popitem(last=False)
+                    self.drops[lane] += 1
+                items[name] = item
+            self._not_empty.notify()
+
+    def _warn_saturated(self, lane, size):
+        """Warns about a lane over its size, at most once per warning_interval"""
+        now = time.monotonic()
+        if now - self._warned.get(lane, -self.warning_interval) < self.warning_interval:
+            return
+        self._warned[lane] = now
+        logger.warning(
+            "Publish queue lane %s is saturated: %d items, %d dropped",
+            lane,
+            size,
+            self.drops[lane],
+        )
+
+    def wait(self, timeout=None):
+        """Waits until the queue has items, returns False on timeout"""
+        with self._not_empty:
+            return self._not_empty.wait_for(lambda: any(self.queues.values()), timeout)
+
+    def get_item(self):
+        """Retrieves and removes the next item from the queue by lane priority"""
+        with self._lock:
+            item = self._pop_weighted({})
+        if item is not None:
+            return item
+        return None, None
+
+    def clear(self):
+        """Clears all items from the queue"""
+        with self._lock:
+            for items in self.queues.values():
+                items.clear()
+
+
+class PublishStore:
+    """
+    Keeps the last published payload of each topic.
+    Payloads larger than large_size are evicted in least recently used order
+    when their total size exceeds the byte budget.
+    """
+
+    def __init__(self, budget=4 * 1024**2, large_size=16 * 1024):
+        """Initializes the PublishStore"""
+        self.budget = budget
+        self.large_size = large_size
+        self.payloads = {}
+        self.large_payloads = OrderedDict()
+        self.large_total = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Returns a string representation of the store."""
+        return f"<{self.__class__.__name__} payloads: {len(self.payloads)}>"
+
+    def __setitem__(self, key, payload):
+        """Saves the payload and evicts large payloads that exceed the budget"""
+        size = len(payload) if isinstance(payload, (str, bytes)) else 0
+        with self._lock:
+            self.large_total -= self.large_payloads.pop(key, 0)
+            self.payloads[key] = payload
+            if size > self.large_size:
+                self.large_payloads[key] = size
+                self.large_total += size
+            while self.large_total > self.budget and self.large_payloads:
+                old_key, old_size = self.large_payloads.popitem(last=False)
+                self.large_total -= old_size
+                self.payloads.pop(old_key, None)
+
+    def get(self, key, default=None):
+        """Returns a saved payload and marks it as recently used"""
+        with self._lock:
+            if key in self.large_payloads:
+                self.large_payloads.move_to_end(key)
+            return self.payloads.get(key, default)
+
+    def keys(self):
+        """Returns the keys of the saved payloads"""
+        with self._lock:
+            return list(self.payloads.keys())
+
+
+def as_number(value):
+    """Returns the value as a float if it's numeric, otherwise None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def template_path(value_template):
+    """Returns the keys that a value template reads from the JSON payload,
+    an empty path for the whole payload or None if the template is complex"""
+    if value_template is None:
+        return ()
+    match = VALUE_TEMPLATE.match(value_template.strip())
+    if match is None:
+        return None
+    return tuple(
+        "".join(groups) for groups in TEMPLATE_KEY.findall(match.group(1) or "")
+    )
+
+
+def value_at(data, path):
+    """Returns the value found at a path of keys, or None"""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def without_paths(data, paths):
+    """Returns a copy of the data without the values found at the paths"""
+    if () in paths:
+        return None
+    if not isinstance(data, dict):
+        return data
+    nested = {}
+    for path in paths:
+        nested.setdefault(path[0], set()).add(path[1:])
+    return {
+        key: without_paths(value, nested[key]) if key in nested else value
+        for key, value in data.items()
+        if () not in nested.get(key, set())
+    }
+
+
+def round_at(data, path, precision):
+    """Rounds the floats found at a path of keys"""
+    if not path:
+        return round_values(data, precision)
+    if not isinstance(data, dict) or path[0] not in data:
+        return data
+    return {
+        **data,
+        path[0]: round_at(data[path[0]], path[1:], precision),
+    }
+
+
+def round_values(data, precision):
+    """Rounds the floats found in the data recursively"""
+    if precision is None:
+        return data
+    if isinstance(data, float):
+        return round(data, int(precision))
+    if isinstance(data, dict):
+        return {key: round_values(value, precision) for key, value in data.items()}
+    if isinstance(data, list):
+        return [round_values(value, precision) for value in data]
+    return data
+
+
+def within_deadband(old, new, deadband):
+    """Checks if the numbers of new data changed less than the deadband.
+    The deadband is an absolute number or a percentage string like 5%"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        return old.keys() == new.keys() and all(
+            within_deadband(old[key], new[key], deadband) for key in new
+        )
+    if isinstance(old, list) and isinstance(new, list):
+        return len(old) == len(new) and all(
+            within_deadband(old_value, new_value, deadband)
+            for old_value, new_value in zip(old, new)
+        )
+    old_number, new_number = as_number(old), as_number(new)
+    if old_number is None or new_number is None:
+        return old == new
+    if isinstance(deadband, str) and deadband.strip().endswith("%"):
+        allowed = abs(old_number) * float(deadband.strip().rstrip("%")) / 100
+    else:
+        allowed = float(deadband)
+    return abs(new_number - old_number) <= allowed
+
+
+def payload_digest(payload):
+    """Returns a compact digest used to detect payload changes"""
+    if isinstance(payload, str):
+        payload = payload.encode("UTF-8")
+    elif not isinstance(payload, bytes):
+        payload = str(payload).encode("UTF-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
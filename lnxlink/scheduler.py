@@ -0,0 +1,282 @@
+"""Runs the addons when their update interval has passed"""
+
+import concurrent.futures
+import heapq
+import inspect
+import logging
+import time
+import traceback
+
+from lnxlink.modules.scripts import helpers
+
+logger = logging.getLogger("lnxlink")
+
+
+# pylint: disable=too-many-instance-attributes
+class Scheduler:
+    """Keeps the addons in a heap ordered by the time they are due. Modules
+    run one after another, or on a thread pool with per-module deadlines when
+    module_workers is set"""
+
+    def __init__(self, lnxlink):
+        self.lnxlink = lnxlink
+        self.schedule = []
+        self.scheduled = set()
+        self.unscheduled = set()
+        self.lwt_time = 0
+        self.module_futures = {}
+        self.start_times = {}
+        self.executor = None
+        self.executor_modules = set()
+        self.module_workers = int(lnxlink.config.get("module_workers") or 0)
+        if self.module_workers > 0:
+            self.executor = self.new_executor()
+
+    def new_executor(self):
+        """Returns a thread pool for the modules"""
+        self.executor_modules = set()
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.module_workers,
+            thread_name_prefix="lnxlink_module",
+        )
+
+    # pylint: disable=too-many-arguments
+    def run_module(
+        self, name, method, retain=True, force_update=False, lane="telemetry"
+    ):
+        """Runs the method of a module"""
+        if self.lnxlink.module_failures.get(name, 0) >= self.lnxlink.max_failures:
+            return
+        try:
+            start_time = time.time()
+            if isinstance(method, (dict, list, bool, bytes, int, str, float)):
+                pub_data = method
+            else:
+                if "force_update" in inspect.signature(method).parameters:
+                    pub_data = self.lnxlink.events.call_method(
+                        method, force_update=force_update
+                    )
+                else:
+                    pub_data = self.lnxlink.events.call_method(method)
+                diff_time = round(time.time() - start_time, 5)
+                self.lnxlink.inference_times[name] = diff_time
+            self.lnxlink.module_failures[name] = 0
+            self.lnxlink.queue_publish(name, pub_data, retain, force_update, lane)
+        except Exception as err:
+            self.module_error(name, err)
+
+    def run_module_pooled(self, name, method):
+        """Runs the method of a module once a worker of the pool is free"""
+        self.start_times[name] = time.monotonic()
+        self.run_module(name, method)
+
+    async def run_module_async(self, name, method):
+        """Runs the coroutine method of a module on the shared event loop"""
+        if self.lnxlink.module_failures.get(name, 0) >= self.lnxlink.max_failures:
+            return
+        try:
+            start_time = time.time()
+            pub_data = await method()
+            diff_time = round(time.time() - start_time, 5)
+            self.lnxlink.inference_times[name] = diff_time
+            self.lnxlink.module_failures[name] = 0
+            self.lnxlink.queue_publish(name, pub_data)
+        except Exception as err:
+            self.module_error(name, err)
+
+    def module_error(self, name, err):
+        """Counts the consecutive failures of a module and reports them"""
+        if isinstance(err, helpers.DependencyPending):
+            logger.debug("Module %s is waiting for %s", name, err)
+            return
+        self.lnxlink.module_failures[name] = (
+            self.lnxlink.module_failures.get(name, 0) + 1
+        )
+        if self.lnxlink.module_failures[name] >= self.lnxlink.max_failures:
+            logger.error(
+                "Module %s disabled after %d consecutive failures. Last error: %s",
+                name,
+                self.lnxlink.max_failures,
+                err,
+            )
+        else:
+            logger.error(
+                "Error with addon %s: %s, %s",
+                name,
+                err,
+                traceback.format_exc(),
+            )
+
+    def module_option(self, service, addon, option, default):
+        """Returns a scheduling option of a module, user settings take priority"""
+        settings = (self.lnxlink.config.get("settings") or {}).get(service)
+        value = None
+        if isinstance(settings, dict):
+            value = settings.get(option)
+        if value is None:
+            value = getattr(addon, option, None)
+        if value is None:
+            value = default
+        return value
+
+    def module_interval(self, service, addon):
+        """Returns the update interval of a module"""
+        interval = self.module_option(
+            service, addon, "update_interval", self.lnxlink.config["update_interval"]
+        )
+        return max(float(interval), 0.1)
+
+    def unschedule(self, service):
+        """Removes an addon from the schedule on the next run of the scheduler,
+        so that it's scheduled again as new if it's reloaded"""
+        self.unscheduled.add(service)
+
+    def schedule_modules(self):
+        """Adds the addons that are not yet scheduled, due immediately"""
+        if self.unscheduled:
+            removed = set()
+            while self.unscheduled:
+                removed.add(self.unscheduled.pop())
+            self.schedule = [
+                entry for entry in self.schedule if entry[1] not in removed
+            ]
+            heapq.heapify(self.schedule)
+            self.scheduled -= removed
+        now = time.monotonic()
+        for service, addon in list(self.lnxlink.addons.items()):
+            if service not in self.scheduled and hasattr(addon, "get_info"):
+                self.scheduled.add(service)
+                heapq.heappush(self.schedule, (now, service))
+
+    def run_due_modules(self):
+        """Runs the modules whose deadline has passed and reschedules them"""
+        now = time.monotonic()
+        due_addons = {}
+        while self.schedule and self.schedule[0][0] <= now:
+            due_time, service = heapq.heappop(self.schedule)
+            addon = self.lnxlink.addons.get(service)
+            if addon is None:
+                self.scheduled.discard(service)
+                continue
+            if self.executor is not None or inspect.iscoroutinefunction(addon.get_info):
+                due_addons[service] = addon
+            else:
+                self.run_module(addon.name, addon.get_info)
+            if getattr(addon, "event_driven", False):
+                continue
+            interval = self.module_interval(service, addon)
+            next_time = due_time + interval
+            if next_time <= time.monotonic():
+                next_time = time.monotonic() + interval
+            heapq.heappush(self.schedule, (next_time, service))
+        if due_addons:
+            self.run_modules_concurrently(due_addons)
+
+    def run_modules_concurrently(self, due_addons):
+        """Runs modules on the thread pool, or the event loop for coroutines,
+        and waits for each one's deadline"""
+        # Only this thread changes the stale modules, they are replaced
+        # instead of changed so that other threads can read them
+        self.lnxlink.stale_modules = frozenset(
+            name
+            for name in self.lnxlink.stale_modules
+            if not self.module_futures[name].done()
+        )
+        deadlines = {}
+        for service, addon in due_addons.items():
+            running = self.module_futures.get(addon.name)
+            if running is not None and not running.done():
+                logger.debug("Module %s is still running, skipping", addon.name)
+                continue
+            timeout = float(
+                self.module_option(
+                    service, addon, "timeout", self.lnxlink.config["update_interval"]
+                )
+            )
+            self.start_times.pop(addon.name, None)
+            if inspect.iscoroutinefunction(addon.get_info):
+                self.start_times[addon.name] = time.monotonic()
+                future = self.lnxlink.events.run_coroutine(
+                    self.run_module_async(addon.name, addon.get_info)
+                )
+            else:
+                future = self.executor.submit(
+                    self.run_module_pooled, addon.name, addon.get_info
+                )
+                self.executor_modules.add(addon.name)
+            self.module_futures[addon.name] = future
+            deadlines[future] = (addon.name, timeout)
+
+        wait_until = time.monotonic() + max(
+            (timeout for _, timeout in deadlines.values()), default=0
+        )
+        for future, (name, timeout) in deadlines.items():
+            if self.wait_module(future, name, timeout, wait_until):
+                continue
+            logger.warning(
+                "Module %s didn't finish within %ss, marking it as stale",
+                name,
+                timeout,
+            )
+            self.lnxlink.stale_modules |= {name}
+            self.lnxlink.inference_times[name] = timeout
+        self.replace_hung_executor()
+
+    def wait_module(self, future, name, timeout, wait_until):
+        """Waits until a module finishes within its deadline, which starts when
+        a worker picks it up. Modules still waiting for a worker at wait_until
+        aren't waited for. Returns False if the module is stale"""
+        while not future.done():
+            started = self.start_times.get(name)
+            deadline = wait_until if started is None else started + timeout
+            if time.monotonic() >= deadline:
+                return started is None
+            try:
+                future.result(timeout=deadline - time.monotonic())
+            except concurrent.futures.TimeoutError:
+                pass
+        return True
+
+    def replace_hung_executor(self):
+        """Starts a new thread pool when stale modules hold all the workers,
+        the stale modules keep running on the old one"""
+        if self.executor is None:
+            return
+        hung = [
+            name for name in self.lnxlink.stale_modules if name in self.executor_modules
+        ]
+        if len(hung) < self.module_workers:
+            return
+        logger.warning(
+            "Stale modules %s hold all module workers, starting new ones",
+            ", ".join(sorted(hung)),
+        )
+        # The modules waiting for a worker run on the new pool next time
+        for name in self.executor_modules:
+            self.module_futures[name].cancel()
+        self.executor.shutdown(wait=False)
+        self.executor = self.new_executor()
+
+    def monitor_run(self):
+        """Gets information from each Addon when it is due and adds it to the queue"""
+        while not self.lnxlink.stop_event.is_set():
+            if self.lnxlink.kill:
+                if self.lnxlink.stop_event.wait(timeout=0.1):
+                    break
+                continue
+            self.schedule_modules()
+            if (
+                time.monotonic() - self.lwt_time
+                >= self.lnxlink.config["update_interval"]
+            ):
+                self.lwt_time = time.monotonic()
+                self.lnxlink.mqtt.send_lwt("ON")
+            self.run_due_modules()
+
+            next_time = self.lwt_time + self.lnxlink.config["update_interval"]
+            if self.schedule:
+                next_time = min(next_time, self.schedule[0][0])
+            timeout = min(max(next_time - time.monotonic(), 0), 1.0)
+            if self.lnxlink.stop_event.wait(timeout=timeout):
+                break
+        logger.info("Stopped monitor_run")
@@ -0,0 +1,156 @@
+"""Disk backed ring buffer that keeps publishes while disconnected"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger("lnxlink")
+
+MAGIC = b"LNXS"
+# Magic, absolute read position, absolute write position
+HEADER = struct.Struct("<4sQQ")
+# Record length, timestamp, retain, topic length
+RECORD = struct.Struct("<IdBH")
+
+
+# pylint: disable=too-many-instance-attributes
+class Spool:
+    """Append only ring file mapped in memory. The oldest publishes are
+    overwritten when it's full, so its size stays the same during long outages"""
+
+    def __init__(self, path, size=1024**2):
+        self.path = path
+        self.size = max(int(size), HEADER.size + RECORD.size + 1024)
+        self.capacity = self.size - HEADER.size
+        self.lock = threading.Lock()
+        self.file = None
+        self.map = None
+        self.head = 0
+        self.tail = 0
+
+    def open(self):
+        """Maps the spool file, creating it when it doesn't exist"""
+        if self.map is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # pylint: disable=consider-using-with
+        self.file = open(self.path, "a+b")
+        file_size = os.fstat(self.file.fileno()).st_size
+        if file_size != self.size:
+            self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        magic, self.head, self.tail = HEADER.unpack_from(self.map, 0)
+        if magic == MAGIC and file_size != self.size:
+            # The records are placed by the old size
+            logger.warning("Spool size changed, dropping the spooled publishes")
+            magic = None
+        if magic != MAGIC or not 0 <= self.tail - self.head <= self.capacity:
+            self.head, self.tail = 0, 0
+            self._write_header()
+
+    def close(self):
+        """Flushes the spool file to disk"""
+        with self.lock:
+            if self.map is None:
+                return
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+            self.map = None
+            self.file = None
+
+    def empty(self):
+        """Checks if there are no spooled publishes"""
+        with self.lock:
+            if self.map is None and os.path.exists(self.path):
+                self.open()
+            return self.head == self.tail
+
+    def append(self, topic, payload, retain=True):
+        """Adds a publish to the spool, dropping the oldest ones when full"""
+        topic = topic.encode("UTF-8")
+        if payload is None:
+            payload = b""
+        elif not isinstance(payload, bytes):
+            payload = str(payload).encode("UTF-8")
+        length = RECORD.size + len(topic) + len(payload)
+        if length > self.capacity:
+            logger.warning("Publish of %s is too large to spool", topic)
+            return
+        record = RECORD.pack(length, time.time(), retain, len(topic))
+        with self.lock:
+            self.open()
+            while self.tail - self.head + length > self.capacity:
+                oldest = self._read_record(self.head)
+                self.head = self.tail if oldest is None else self.head + oldest[0]
+            self._write(self.tail, record + topic + payload)
+            self.tail += length
+            self._write_header()
+
+    def read(self, count):
+        """Returns the oldest spooled publishes and the position after them,
+        which is passed to commit when they have been sent"""
+        records = []
+        with self.lock:
+            if self.map is None:
+                return records, self.head
+            position = self.head
+            while position < self.tail and len(records) < count:
+                record = self._read_record(position)
+                if record is None:
+                    # Dropped by the next commit
+                    logger.error("Spool file is corrupted, dropping the rest")
+                    return records, self.tail
+                length, record = record
+                records.append(record)
+                position += length
+            return records, position
+
+    def _read_record(self, position):
+        """Returns the length and the publish of a record, or None if the
+        record doesn't fit in the spooled data"""
+        if self.tail - position < RECORD.size:
+            return None
+        header = self._read(position, RECORD.size)
+        length, timestamp, retain, topic_length = RECORD.unpack(header)
+        if not RECORD.size + topic_length <= length <= self.tail - position:
+            return None
+        data = self._read(position + RECORD.size, length - RECORD.size)
+        try:
+            topic = data[:topic_length].decode("UTF-8")
+        except UnicodeDecodeError:
+            return None
+        return length, (timestamp, topic, data[topic_length:], bool(retain))
+
+    def commit(self, position):
+        """Removes the publishes before the position from the spool"""
+        with self.lock:
+            if self.map is None or position < self.head:
+                return
+            self.head = min(position, self.tail)
+            if self.head == self.tail:
+                self.head, self.tail = 0, 0
+            self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, self.head, self.tail)
+
+    def _write(self, position, data):
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        start = HEADER.size + offset
+        self.map[start : start + first] = data[:first]
+        if first < len(data):
+            self.map[HEADER.size : HEADER.size + len(data) - first] = data[first:]
+
+    def _read(self, position, length):
+        offset = position % self.capacity
+        first = min(length, self.capacity - offset)
+        start = HEADER.size + offset
+        data = self.map[start : start + first]
+        if first < length:
+            data += self.map[HEADER.size : HEADER.size + length - first]
+        return data
@@ -0,0 +1,91 @@
+"""Shared snapshots of the kernel statistics used by the monitoring modules"""
+
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import psutil
+
+
+@dataclass
+class Snapshot:
+    """Kernel statistics read at a monotonic timestamp"""
+
+    time: float
+    data: dict
+
+
+def read_proc_stat():
+    """Reads the aggregated CPU times from /proc/stat"""
+    with open("/proc/stat", encoding="UTF-8") as file:
+        fields = file.readline().split()[1:]
+    names = ["user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal"]
+    return dict(zip(names, map(int, fields)))
+
+
+def read_meminfo():
+    """Reads /proc/meminfo in bytes"""
+    meminfo = {}
+    with open("/proc/meminfo", encoding="UTF-8") as file:
+        for line in file:
+            key, value = line.split(":", 1)
+            meminfo[key] = int(value.split()[0]) * 1024
+    return meminfo
+
+
+def read_net_dev():
+    """Reads the received and sent bytes of all interfaces from /proc/net/dev"""
+    counters = {"bytes_recv": 0, "bytes_sent": 0}
+    with open("/proc/net/dev", encoding="UTF-8") as file:
+        for line in file.readlines()[2:]:
+            _, values = line.split(":", 1)
+            values = values.split()
+            counters["bytes_recv"] += int(values[0])
+            counters["bytes_sent"] += int(values[8])
+    return counters
+
+
+def read_block_stats():
+    """Reads /sys/block/*/stat for every block device"""
+    stats = {}
+    for stat_path in glob.glob("/sys/block/*/stat"):
+        disk = os.path.basename(os.path.dirname(stat_path))
+        try:
+            with open(stat_path, encoding="UTF-8") as file:
+                stats[disk] = list(map(int, file.read().split()))
+        except OSError:
+            continue
+    return stats
+
+
+class SystemSampler:
+    """Reads each kernel statistics source once per tick and keeps the previous
+    snapshot, so that every module calculates rates over the same time window"""
+
+    def __init__(self, max_age=0.5):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.snapshots = {}
+        self.readers = {
+            "cpu": read_proc_stat,
+            "memory": read_meminfo,
+            "network": read_net_dev,
+            "disks": read_block_stats,
+            "temperature": psutil.sensors_temperatures,
+        }
+
+    def sample(self, source):
+        """Returns the previous and the current snapshot of a source"""
+        now = time.monotonic()
+        with self.lock:
+            previous, current = self.snapshots.get(source, (None, None))
+            if current is None or now - current.time > self.max_age:
+                previous, current = current, Snapshot(now, self.readers[source]())
+                self.snapshots[source] = (previous, current)
+            return previous, current
+
+    def get(self, source):
+        """Returns the current data of a source"""
+        return self.sample(source)[1].data
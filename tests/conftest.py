@@ -0,0 +1,26 @@
+"""Shared fixtures of the LNXlink tests"""
+
+import pytest
+import yaml
+
+from lnxlink import __main__ as lnxlink_main
+from lnxlink.consts import CONFIGTEMP
+
+
+@pytest.fixture(name="config_path")
+def fixture_config_path(tmp_path):
+    """Writes the default configuration to a temporary directory"""
+    config = yaml.safe_load(CONFIGTEMP)
+    config["exclude"] = []
+    path = tmp_path / "lnxlink.yaml"
+    path.write_text(yaml.dump(config, sort_keys=False), encoding="UTF-8")
+    return str(path)
+
+
+@pytest.fixture(name="lnxlink")
+def fixture_lnxlink(config_path):
+    """LNXlink with the default configuration that isn't connected"""
+    config = lnxlink_main.config_setup.read_config(config_path)
+    instance = lnxlink_main.LNXlink(config)
+    yield instance
+    instance.disconnect()
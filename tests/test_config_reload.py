@@ -0,0 +1,74 @@
+"""Tests of reloading the configuration while running"""
+
+import yaml
+
+
+def edit_config(config_path, edit):
+    """Changes the configuration file like a user would"""
+    with open(config_path, encoding="UTF-8") as config_file:
+        config = yaml.safe_load(config_file)
+    edit(config)
+    with open(config_path, "w", encoding="UTF-8") as config_file:
+        yaml.dump(config, config_file, sort_keys=False)
+
+
+def watch_reload(lnxlink):
+    """Records the restarts and the addons that are initialized again"""
+    calls = {"restart": 0, "init": []}
+
+    def restart_script():
+        calls["restart"] += 1
+
+    def init_addon(addon):
+        calls["init"].append(addon.service)
+
+    lnxlink.restart_script = restart_script
+    lnxlink._init_addon = init_addon  # pylint: disable=protected-access
+    return calls
+
+
+def test_unchanged_config_doesnt_restart(lnxlink):
+    """Keys set while starting aren't configuration changes"""
+    lnxlink.loaded_modules = lnxlink._parse_modules(  # pylint: disable=protected-access
+        lnxlink.config
+    )
+    calls = watch_reload(lnxlink)
+    lnxlink.reload_config()
+    assert calls == {"restart": 0, "init": []}
+
+
+def test_settings_change_reloads_only_its_addon(lnxlink, config_path):
+    """Editing one settings entry reloads its addon without restarting"""
+    lnxlink.loaded_modules = lnxlink._parse_modules(  # pylint: disable=protected-access
+        lnxlink.config
+    )
+    calls = watch_reload(lnxlink)
+
+    def expose_command(config):
+        config["settings"]["bash"] = {
+            "allow_any_command": False,
+            "expose": [{"name": "Uptime", "command": "uptime"}],
+        }
+
+    edit_config(config_path, expose_command)
+    lnxlink.reload_config()
+    assert calls == {"restart": 0, "init": ["bash"]}
+    assert lnxlink.config["settings"]["bash"]["expose"][0]["name"] == "Uptime"
+
+
+def test_addon_without_disconnect_restarts(lnxlink, config_path):
+    """An addon that can't be stopped isn't started a second time"""
+    lnxlink.loaded_modules = lnxlink._parse_modules(  # pylint: disable=protected-access
+        lnxlink.config
+    )
+    running = lnxlink.loaded_modules["bash"](lnxlink)
+    lnxlink.addons["bash"] = running
+    calls = watch_reload(lnxlink)
+
+    def allow_any_command(config):
+        config["settings"]["bash"] = {"allow_any_command": True, "expose": []}
+
+    edit_config(config_path, allow_any_command)
+    lnxlink.reload_config()
+    assert calls == {"restart": 1, "init": []}
+    assert lnxlink.addons == {"bash": running}
@@ -0,0 +1,20 @@
+"""Tests of the Home Assistant discovery"""
+
+from lnxlink.homeassistant_api import PublishInfo
+
+
+def test_failed_discovery_is_republished(lnxlink):
+    """The hash of a discovery config is only kept when it was published"""
+    published = []
+
+    def publish(topic, payload, retain=True, expiry=None, qos=None):
+        published.append(topic)
+        # The first publish fails
+        return PublishInfo(rc=4 if len(published) == 1 else 0, mid=len(published))
+
+    lnxlink.mqtt.publish = publish
+    hashes = {}
+    for _ in range(3):
+        lnxlink.mqtt.publish_discovery("homeassistant/sensor/test", {"a": 1}, hashes)
+    assert published == ["homeassistant/sensor/test"] * 2
+    assert "homeassistant/sensor/test" in hashes
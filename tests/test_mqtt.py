@@ -0,0 +1,122 @@
+"""Tests of the MQTT transport"""
+
+import asyncio
+import threading
+
+import paho.mqtt.client as paho_client
+import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from lnxlink import __main__ as lnxlink_main
+from lnxlink.homeassistant_api import HomeAssistantApiClient, PublishInfo
+
+
+def test_ack_during_publish_doesnt_deadlock(lnxlink):
+    """The network thread can acknowledge a message while it's published"""
+    mqtt = lnxlink.mqtt
+    acked = []
+
+    def publish(topic, payload=None, qos=0, retain=False, properties=None):
+        # paho calls on_publish from its network thread holding its own lock
+        ack = threading.Thread(target=mqtt.on_publish, args=(None, None, 1))
+        ack.start()
+        ack.join(timeout=2)
+        acked.append(not ack.is_alive())
+        return PublishInfo(rc=0, mid=1)
+
+    mqtt.client.client.publish = publish
+    mqtt.publish("lnxlink/test", "1", qos=1)
+    assert acked == [True]
+    # The early acknowledgement is matched with the published message
+    assert mqtt.diagnostics["inflight"]["qos1"] == 0
+
+
+@pytest.fixture(name="lnxlink_v5")
+def fixture_lnxlink_v5(config_path):
+    """LNXlink that uses MQTT v5 with a broker that accepts 10 aliases"""
+    config = lnxlink_main.config_setup.read_config(config_path)
+    config["mqtt"]["protocol"] = "5"
+    instance = lnxlink_main.LNXlink(config)
+    instance.mqtt.client.alias_maximum = 10
+    yield instance
+    instance.disconnect()
+
+
+def test_default_telemetry_uses_alias(lnxlink_v5):
+    """Retained QoS 1 telemetry, the default, gets an alias and an expiry"""
+    sent = []
+
+    def publish(topic, payload=None, qos=0, retain=False, properties=None):
+        sent.append((topic, qos, retain, properties))
+        return PublishInfo(rc=0, mid=len(sent))
+
+    lnxlink_v5.mqtt.client.client.publish = publish
+    for value in range(3):
+        lnxlink_v5.publish_monitor_data("CPU Usage", value)
+    topic = f"{lnxlink_v5.config['pref_topic']}/monitor_controls/cpu_usage"
+    assert [message[:3] for message in sent] == [
+        (topic, 1, True),
+        (topic, 1, True),
+        ("", 1, True),
+    ]
+    assert not hasattr(sent[0][3], "TopicAlias")
+    assert sent[1][3].TopicAlias == sent[2][3].TopicAlias == 1
+    assert sent[2][3].MessageExpiryInterval == 3600
+
+
+def test_resent_messages_get_their_topics(lnxlink_v5):
+    """Messages sent again after reconnecting don't use the old aliases"""
+    client = lnxlink_v5.mqtt.client
+    client.topic_aliases = {"lnxlink/test": 1}
+    properties = Properties(PacketTypes.PUBLISH)
+    properties.TopicAlias = 1
+    message = paho_client.MQTTMessage(mid=1, topic=b"")
+    message.properties = properties
+    client.client._out_messages[1] = message  # pylint: disable=protected-access
+    client._on_connect = lambda *args: None  # pylint: disable=protected-access
+    client.on_connect(client.client, None, None, 0, None)
+    assert message.topic == "lnxlink/test"
+    assert not hasattr(message.properties, "TopicAlias")
+    assert not client.topic_aliases
+
+
+# pylint: disable=protected-access
+def test_unacknowledged_websocket_publish_falls_back(lnxlink):
+    """Publishes that Home Assistant rejected or didn't acknowledge are sent
+    with HTTP requests and reported as failed when those fail too"""
+    failed = []
+    done = threading.Event()
+
+    def publish_failed(topic, payload, retain):
+        failed.append(topic)
+        if len(failed) == 2:
+            done.set()
+
+    client = HomeAssistantApiClient(lnxlink.config, lnxlink.loop, publish_failed)
+    client._post_publish = lambda service_data: 1
+
+    class Websocket:
+        """Rejects the publishes to the rejected topic and ignores the rest"""
+
+        async def send_json(self, data):
+            """Answers like Home Assistant would"""
+            if data["service_data"]["topic"] == "lnxlink/rejected":
+                waiter, _ = client._pending[data["id"]]
+                waiter.set_result({"success": False})
+
+    async def send():
+        client._outbox = asyncio.Queue()
+        for topic in ["lnxlink/rejected", "lnxlink/ignored"]:
+            client._outbox.put_nowait(
+                {"topic": topic, "payload": "1", "qos": 1, "retain": True}
+            )
+        sender = asyncio.ensure_future(
+            client._send_publishes(Websocket(), {"batch_size": 50, "timeout": 0.1})
+        )
+        await client._outbox.join()
+        sender.cancel()
+
+    asyncio.run_coroutine_threadsafe(send(), lnxlink.loop).result(timeout=5)
+    assert done.wait(timeout=5)
+    assert sorted(failed) == ["lnxlink/ignored", "lnxlink/rejected"]
@@ -0,0 +1,58 @@
+"""Tests of the background installation of module dependencies"""
+
+import threading
+
+from lnxlink.modules.scripts import helpers
+
+
+def test_install_error_notifies_listeners(tmp_path, monkeypatch):
+    """An exception while installing still clears the pending package"""
+    notified = threading.Event()
+    results = []
+
+    def install_package(package_version, wheelhouse):
+        raise OSError("Read-only file system")
+
+    def listener(package_version, success):
+        results.append((package_version, success))
+        notified.set()
+
+    monkeypatch.setattr(helpers, "install_package", install_package)
+    provisioner = helpers.Provisioner(str(tmp_path / "wheels"))
+    provisioner.add_listener(listener)
+    provisioner.request("missing==1.0")
+    assert notified.wait(timeout=5)
+    assert results == [("missing==1.0", False)]
+    assert "missing==1.0" not in provisioner.pending
+    assert "missing==1.0" in provisioner.failed
+
+
+def test_failed_install_is_retried(tmp_path, monkeypatch):
+    """A failed package is installed again after a backoff"""
+    notified = threading.Event()
+    results = []
+
+    def install_package(package_version, wheelhouse):
+        return len(results) > 0
+
+    def listener(package_version, success):
+        results.append(success)
+        if success:
+            notified.set()
+
+    monkeypatch.setattr(helpers, "install_package", install_package)
+    provisioner = helpers.Provisioner(str(tmp_path / "wheels"))
+    provisioner.retry_delay = 0.1
+    provisioner.add_listener(listener)
+    provisioner.request("flaky==1.0")
+    assert notified.wait(timeout=5)
+    assert results == [False, True]
+    assert "flaky==1.0" not in provisioner.failed
+
+
+def test_disconnect_removes_the_listener(lnxlink):
+    """A stopped LNXlink isn't notified about installations"""
+    lnxlink.disconnect()
+    assert lnxlink._dependency_installed not in (  # pylint: disable=protected-access
+        lnxlink.provisioner.listeners
+    )
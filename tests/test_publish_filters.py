@@ -0,0 +1,60 @@
+"""Deadband and precision filters of the published entities"""
+
+from lnxlink.homeassistant_api import PublishInfo
+
+
+class CpuAddon:
+    """Two entities that read their values from the same JSON topic"""
+
+    name = "CPU Usage"
+
+    def exposed_controls(self):
+        """Same as the controls of the CPU addon"""
+        return {
+            "CPU Usage": {
+                "type": "sensor",
+                "value_template": "{{ value_json.get('percent')}}",
+            },
+            "CPU Load Average": {
+                "type": "sensor",
+                "value_template": "{{ value_json.get('load_percent')}}",
+            },
+        }
+
+
+def watch_publish(lnxlink, filters):
+    """Sets up the CPU addon with the user filters and records its publishes"""
+    published = []
+
+    def publish(topic, payload, retain=True, expiry=None, qos=None):
+        published.append(payload)
+        return PublishInfo(rc=0, mid=len(published))
+
+    lnxlink.mqtt.publish = publish
+    lnxlink.mqtt.set_connected()
+    lnxlink.config["update_on_change"] = False
+    lnxlink.config["settings"]["cpu"] = {"filters": filters}
+    addon = CpuAddon()
+    lnxlink.update_publish_filters("cpu", addon, addon.exposed_controls())
+    return published
+
+
+def test_deadband_filters_only_its_entity(lnxlink):
+    """A change of another entity on the same topic is published"""
+    published = watch_publish(lnxlink, {"CPU Usage": {"deadband": 5}})
+    lnxlink.publish_monitor_data("CPU Usage", {"percent": 10, "load_percent": 0.5})
+    lnxlink.publish_monitor_data("CPU Usage", {"percent": 12, "load_percent": 0.5})
+    lnxlink.publish_monitor_data("CPU Usage", {"percent": 12, "load_percent": 3.9})
+    lnxlink.publish_monitor_data("CPU Usage", {"percent": 20, "load_percent": 3.9})
+    assert published == [
+        '{"percent": 10, "load_percent": 0.5}',
+        '{"percent": 12, "load_percent": 3.9}',
+        '{"percent": 20, "load_percent": 3.9}',
+    ]
+
+
+def test_precision_rounds_only_its_entity(lnxlink):
+    """The precision of an entity doesn't round the other values of the topic"""
+    published = watch_publish(lnxlink, {"CPU Usage": {"precision": 0}})
+    lnxlink.publish_monitor_data("CPU Usage", {"percent": 10.26, "load_percent": 0.26})
+    assert published == ['{"percent": 10.0, "load_percent": 0.26}']
@@ -0,0 +1,43 @@
+"""Latency from collecting module data until it is published"""
+
+import threading
+import time
+
+from lnxlink.homeassistant_api import PublishInfo
+
+MESSAGES = 500
+
+
+def test_publish_latency(lnxlink):
+    """Queued data are published right away, without a rate ceiling"""
+    published = {}
+    done = threading.Event()
+
+    def publish(topic, payload, retain=True, expiry=None, qos=None):
+        published[topic] = time.monotonic()
+        if len(published) == MESSAGES:
+            done.set()
+        return PublishInfo(rc=0, mid=len(published))
+
+    lnxlink.mqtt.publish = publish
+    lnxlink.mqtt.set_connected()
+    lnxlink.kill = False
+    threading.Thread(target=lnxlink.monitor_queue, daemon=True).start()
+
+    queued = {}
+    start_time = time.monotonic()
+    for num in range(MESSAGES):
+        name = f"Sensor {num}"
+        queued[
+            f"{lnxlink.config['pref_topic']}/monitor_controls/sensor_{num}"
+        ] = time.monotonic()
+        lnxlink.run_module(name, num, lane="event")
+    assert done.wait(timeout=5)
+    total = time.monotonic() - start_time
+
+    latencies = sorted(
+        published[topic] - queued_time for topic, queued_time in queued.items()
+    )
+    # 100 messages per second, the old default, would need 5 seconds
+    assert total < 2
+    assert latencies[int(len(latencies) * 0.95)] < 0.5
@@ -0,0 +1,21 @@
+"""Tests of the lanes of the publish queue"""
+
+from lnxlink.publishing import UniqueQueue
+
+
+def test_event_lane_drops_the_oldest_over_its_hard_limit():
+    """Events pile up while disconnected only until the hard limit"""
+    queue = UniqueQueue({"event": {"max_size": 2, "hard_limit": 3}})
+    for num in range(5):
+        queue.add_item("Button", num, lane="event")
+    assert [item[1][0] for item in queue] == [2, 3, 4]
+    assert queue.drops["event"] == 2
+
+
+def test_lane_without_policy():
+    """A configured lane gets the default options that it doesn't set"""
+    queue = UniqueQueue({"bulk": {"max_size": 1}})
+    queue.add_item("Sensor 1", 1, lane="bulk")
+    queue.add_item("Sensor 2", 2, lane="bulk")
+    assert queue.get_item()[0] == "Sensor 2"
+    assert queue.drops["bulk"] == 1
@@ -0,0 +1,94 @@
+"""Tests of the module scheduler"""
+
+import asyncio
+import time
+
+from lnxlink.scheduler import Scheduler
+
+
+class HungAddon:
+    """Addon whose coroutine never finishes"""
+
+    name = "Hung"
+    timeout = 0.2
+
+    async def get_info(self):
+        """Never returns"""
+        await asyncio.sleep(60)
+
+
+def test_hung_async_module_is_stale(lnxlink):
+    """A hung coroutine doesn't block the scheduler past its deadline"""
+    lnxlink.addons["hung"] = HungAddon()
+    lnxlink.scheduler.schedule_modules()
+    start_time = time.monotonic()
+    lnxlink.scheduler.run_due_modules()
+    assert time.monotonic() - start_time < 2
+    assert "Hung" in lnxlink.stale_modules
+
+    # It is skipped while the previous run is still going
+    lnxlink.scheduler.schedule = [(0, "hung")]
+    start_time = time.monotonic()
+    lnxlink.scheduler.run_due_modules()
+    assert time.monotonic() - start_time < 0.1
+
+
+class EventAddon:
+    """Addon that publishes on events after its initial update"""
+
+    name = "Event"
+    event_driven = True
+
+    def __init__(self):
+        self.runs = 0
+
+    def get_info(self):
+        """Counts its updates"""
+        self.runs += 1
+
+
+def test_reloaded_event_addon_runs_again(lnxlink):
+    """A reloaded event driven addon gets its initial update again"""
+    lnxlink.addons["event"] = EventAddon()
+    lnxlink.scheduler.schedule_modules()
+    lnxlink.scheduler.run_due_modules()
+
+    lnxlink._stop_addon("event")  # pylint: disable=protected-access
+    reloaded = EventAddon()
+    lnxlink.addons["event"] = reloaded
+    lnxlink.scheduler.schedule_modules()
+    lnxlink.scheduler.run_due_modules()
+    assert reloaded.runs == 1
+
+
+class SlowAddon:
+    """Addon that takes longer than its deadline"""
+
+    timeout = 0.2
+
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+
+    def get_info(self):
+        """Returns after the delay"""
+        time.sleep(self.delay)
+        return 1
+
+
+def test_hung_modules_dont_starve_the_others(lnxlink):
+    """Modules waiting for a worker aren't stale and get new workers when
+    hung modules hold all of them"""
+    lnxlink.config["module_workers"] = 1
+    lnxlink.scheduler = Scheduler(lnxlink)
+    lnxlink.addons["hung"] = SlowAddon("Hung", 1)
+    lnxlink.addons["quick"] = SlowAddon("Quick", 0)
+    lnxlink.scheduler.schedule_modules()
+    lnxlink.scheduler.run_due_modules()
+    assert lnxlink.stale_modules == {"Hung"}
+
+    # The quick module gets a worker of the new pool
+    lnxlink.scheduler.schedule = [(0, "quick")]
+    lnxlink.scheduler.run_due_modules()
+    assert lnxlink.stale_modules == {"Hung"}
+    assert lnxlink.inference_times["Quick"] < 0.2
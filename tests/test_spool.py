@@ -0,0 +1,75 @@
+"""Tests of the spool of modules that publish while disconnected"""
+
+from lnxlink import __main__ as lnxlink_main
+from lnxlink.homeassistant_api import PublishInfo
+from lnxlink.spool import HEADER, Spool
+
+
+class BatteryAddon:
+    """Addon whose name differs from its service"""
+
+    service = "battery"
+
+    def __init__(self, lnxlink):
+        self.name = "Battery"
+
+
+def test_spool_matches_service(config_path, tmp_path):
+    """Modules are listed in the config by their service, not their name"""
+    config = lnxlink_main.config_setup.read_config(config_path)
+    config["spool"] = {"modules": ["battery"], "path": str(tmp_path / "spool.bin")}
+    instance = lnxlink_main.LNXlink(config)
+    try:
+        instance._init_addon(BatteryAddon)  # pylint: disable=protected-access
+        instance.queue_publish("Battery", {"level": 50})
+        assert not instance.spool.empty()
+    finally:
+        instance.disconnect()
+
+
+def test_spool_size_change_resets_it(tmp_path):
+    """Records placed by the old size aren't read with the new one"""
+    path = str(tmp_path / "spool.bin")
+    spool = Spool(path, 4096)
+    spool.append("lnxlink/monitor_controls/battery", "50")
+    spool.close()
+    spool = Spool(path, 8192)
+    assert spool.empty()
+    assert not spool.read(10)[0]
+
+
+def test_corrupted_record_is_dropped(tmp_path):
+    """A garbage record length doesn't make reading loop forever"""
+    spool = Spool(str(tmp_path / "spool.bin"), 4096)
+    spool.append("lnxlink/monitor_controls/battery", "50")
+    spool.append("lnxlink/monitor_controls/battery", "49")
+    first_length = spool.read(1)[1]
+    spool.map[HEADER.size + first_length : HEADER.size + first_length + 4] = bytes(4)
+    records, position = spool.read(10)
+    assert [payload for _, _, payload, _ in records] == [b"50"]
+    spool.commit(position)
+    assert spool.empty()
+
+
+def test_replay_skips_topics_published_since(config_path, tmp_path):
+    """Spooled data don't replace the data published after them"""
+    config = lnxlink_main.config_setup.read_config(config_path)
+    config["spool"] = {"modules": ["battery"], "path": str(tmp_path / "spool.bin")}
+    instance = lnxlink_main.LNXlink(config)
+    published = []
+
+    def publish(topic, payload, retain=True, expiry=None, qos=None):
+        published.append(payload)
+        return PublishInfo(rc=0, mid=len(published))
+
+    try:
+        instance._init_addon(BatteryAddon)  # pylint: disable=protected-access
+        instance.publish_monitor_data("Battery", {"level": 50})
+        instance.mqtt.publish = publish
+        instance.mqtt.set_connected()
+        instance.publish_monitor_data("Battery", {"level": 49})
+        instance._replay_spool()  # pylint: disable=protected-access
+        assert published == ['{"level": 49}']
+        assert instance.spool.empty()
+    finally:
+        instance.disconnect()
@@ -0,0 +1,122 @@
+"""Tests of the startup cost of the command line"""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from lnxlink import __main__ as lnxlink_main
+
+# Needed only once LNXlink runs, not to print its version
+HEAVY_MODULES = ["asyncio", "inotify", "jeepney", "paho", "psutil", "yaml"]
+# Modules that lnxlink --version may import on top of the interpreter's own
+IMPORT_BUDGET = 120
+CONNECT_BUDGET = 2
+
+
+def imported_modules(*args):
+    """Returns the modules that python -X importtime reports for a command"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout, [
+        line.rsplit("|", 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and not line.endswith("imported package")
+    ]
+
+
+def test_version_skips_heavy_imports():
+    """lnxlink --version doesn't import the runtime dependencies"""
+    output, modules = imported_modules("-m", "lnxlink", "--version")
+    assert output.strip()
+    imported = {module.split(".")[0] for module in modules}
+    assert not imported.intersection(HEAVY_MODULES)
+
+
+def test_version_import_budget():
+    """lnxlink --version stays within its budget of imported modules"""
+    _, interpreter = imported_modules("-c", "pass")
+    _, modules = imported_modules("-m", "lnxlink", "--version")
+    assert len(modules) - len(interpreter) <= IMPORT_BUDGET, modules
+
+
+def serve_broker(server):
+    """Accepts MQTT connections and ignores everything after the CONNACK"""
+    while True:
+        try:
+            connection, _ = server.accept()
+        except OSError:
+            return
+        with connection:
+            connection.recv(1024)
+            connection.sendall(bytes([0x20, 0x02, 0x00, 0x00]))
+            while connection.recv(65536):
+                pass
+
+
+def stub_broker_config(config_path):
+    """Starts a stub broker and returns the configuration that connects to it"""
+    server = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(target=serve_broker, args=(server,), daemon=True).start()
+    config = lnxlink_main.config_setup.read_config(config_path)
+    config["mqtt"]["server"] = "127.0.0.1"
+    config["mqtt"]["port"] = server.getsockname()[1]
+    config["mqtt"]["auth"]["user"] = ""
+    config["modules"] = ["cpu"]
+    return server, config
+
+
+def test_time_to_connect(config_path):
+    """LNXlink connects to the broker while its addons are initializing"""
+    server, config = stub_broker_config(config_path)
+    lnxlink = lnxlink_main.LNXlink(config)
+    try:
+        start_time = time.monotonic()
+        lnxlink.start([])
+        assert lnxlink.mqtt.connected_event.wait(timeout=CONNECT_BUDGET)
+        assert time.monotonic() - start_time < CONNECT_BUDGET
+    finally:
+        lnxlink.disconnect()
+        server.close()
+
+
+SLOW_ADDON = """
+import time
+
+
+class Addon:
+    startup_timeout = 0.2
+
+    def __init__(self, lnxlink):
+        self.name = "Slow"
+        time.sleep(1)
+"""
+
+
+def test_slow_addon_doesnt_hold_the_startup(config_path, tmp_path):
+    """The startup waits for an addon only until its own deadline"""
+    slow_addon = tmp_path / "slow.py"
+    slow_addon.write_text(SLOW_ADDON, encoding="UTF-8")
+    server, config = stub_broker_config(config_path)
+    config["custom_modules"] = [str(slow_addon)]
+    lnxlink = lnxlink_main.LNXlink(config)
+    try:
+        start_time = time.monotonic()
+        lnxlink.start([])
+        assert time.monotonic() - start_time < 0.9
+        assert lnxlink.late_addons == {"slow"}
+        assert "cpu" in lnxlink.addons
+        # It's added when its initialization finishes
+        time.sleep(1)
+        assert not lnxlink.late_addons
+        assert "slow" in lnxlink.addons
+    finally:
+        lnxlink.disconnect()
+        server.close()